@@ -48,16 +48,65 @@ def get_google_cloud_config():
     return {
         'project_id': os.getenv('GOOGLE_CLOUD_PROJECT_ID', 'project-final-laka-93110'),
         'dataset_id': os.getenv('GOOGLE_CLOUD_DATASET_ID', 'Laka10'),
-        'table_id': os.getenv('GOOGLE_CLOUD_TABLE_ID', 'openfoodfacts')
+        'table_id': os.getenv('GOOGLE_CLOUD_TABLE_ID', 'openfoodfacts'),
+        'load_format': os.getenv('BIGQUERY_LOAD_FORMAT', 'csv').lower(),
+        'write_mode': os.getenv('BIGQUERY_WRITE_MODE', 'truncate').lower(),
+        'soft_delete': os.getenv('BIGQUERY_SOFT_DELETE', 'false').lower() == 'true',
+        'staging_suffix': os.getenv('BIGQUERY_STAGING_SUFFIX', '_staging'),
+        'transform_mode': os.getenv('BIGQUERY_TRANSFORM_MODE', 'pandas').lower(),
+        'transformed_table_id': os.getenv('GOOGLE_CLOUD_TRANSFORMED_TABLE_ID', ''),
+        'use_bqstorage': os.getenv('BIGQUERY_USE_STORAGE_API', 'false').lower() == 'true',
+        'partitioning': os.getenv('BIGQUERY_PARTITIONING', 'none').lower(),
+        'partition_overwrite': os.getenv('BIGQUERY_PARTITION_OVERWRITE', 'false').lower() == 'true',
+        'run_id': os.getenv('PIPELINE_RUN_ID', ''),
+        'run_id_range': [int(value) for value in os.getenv('BIGQUERY_RUN_ID_RANGE', '19000,29000,1').split(',')],
+        'clustering_fields': [field.strip() for field in
+                              os.getenv('BIGQUERY_CLUSTERING_FIELDS', 'nutriscore_grade,brands,code').split(',')
+                              if field.strip()]
     }
 
+# Types acceptes pour les champs supplementaires
+FIELD_TYPES = ('str', 'float')
+
+def parse_field_specs(value):
+    """Lit des champs supplementaires au format nom=chemin.source:type separes par des virgules"""
+    fields = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, source = item.partition('=')
+        source, _, field_type = source.partition(':')
+        field_type = field_type.strip() or 'str'
+        if field_type not in FIELD_TYPES:
+            raise ValueError(
+                f"Type inconnu '{field_type}' pour le champ '{name.strip()}' "
+                f"(types acceptes : {', '.join(FIELD_TYPES)})"
+            )
+        fields.append((name.strip(), source.strip() or name.strip(), field_type))
+    return fields
+
 # Configuration API
 def get_api_config():
     """Retourne la configuration de l'API"""
     return {
         'url': os.getenv('OPENFOODFACTS_API_URL', 'https://world.openfoodfacts.org'),
         'page_size': int(os.getenv('OPENFOODFACTS_PAGE_SIZE', '1000')),
-        'num_pages': int(os.getenv('OPENFOODFACTS_NUM_PAGES', '20'))
+        'num_pages': int(os.getenv('OPENFOODFACTS_NUM_PAGES', '20')),
+        'max_workers': int(os.getenv('OPENFOODFACTS_MAX_WORKERS', '4')),
+        'requests_per_second': float(os.getenv('OPENFOODFACTS_REQUESTS_PER_SECOND', '1')),
+        'timeout': float(os.getenv('OPENFOODFACTS_TIMEOUT', '10')),
+        'max_retries': int(os.getenv('OPENFOODFACTS_MAX_RETRIES', '5')),
+        'backoff_factor': float(os.getenv('OPENFOODFACTS_BACKOFF_FACTOR', '0.5')),
+        'retry_budget': int(os.getenv('OPENFOODFACTS_RETRY_BUDGET', '50')),
+        'circuit_breaker_threshold': int(os.getenv('OPENFOODFACTS_CIRCUIT_BREAKER_THRESHOLD', '5')),
+        'circuit_breaker_cooldown': float(os.getenv('OPENFOODFACTS_CIRCUIT_BREAKER_COOLDOWN', '60')),
+        'stream_json': os.getenv('OPENFOODFACTS_STREAM_JSON', 'true').lower() in ('1', 'true', 'yes', 'oui'),
+        'extraction_mode': os.getenv('OPENFOODFACTS_EXTRACTION_MODE', 'full'),
+        'delta_max_pages': int(os.getenv('OPENFOODFACTS_DELTA_MAX_PAGES', '100')),
+        'dump_path': os.getenv('OPENFOODFACTS_DUMP_PATH', ''),
+        'dump_chunk_size': int(os.getenv('OPENFOODFACTS_DUMP_CHUNK_SIZE', '50000')),
+        'extra_fields': parse_field_specs(os.getenv('OPENFOODFACTS_EXTRA_FIELDS', ''))
     }
 
 # Configuration des fichiers
@@ -67,7 +116,44 @@ def get_file_config():
         'data_directory': os.getenv('DATA_DIRECTORY', 'data'),
         'csv_original_filename': os.getenv('CSV_ORIGINAL_FILENAME', 'openfood_referentiel.csv'),
         'csv_cleaned_filename': os.getenv('CSV_CLEANED_FILENAME', 'openfood_referentiel_cleaned.csv'),
-        'csv_transformed_filename': os.getenv('CSV_TRANSFORMED_FILENAME', 'openfood_transformed.csv')
+        'csv_transformed_filename': os.getenv('CSV_TRANSFORMED_FILENAME', 'openfood_transformed.csv'),
+        'checkpoint_directory': os.getenv('CHECKPOINT_DIRECTORY', 'checkpoints'),
+        'delta_state_filename': os.getenv('DELTA_STATE_FILENAME', 'delta_state.json'),
+        'dictionary_directory': os.getenv('DICTIONARY_DIRECTORY', str(Path(__file__).parent / 'dictionaries')),
+        'storage_format': os.getenv('STORAGE_FORMAT', 'csv').lower(),
+        'parquet_compression': os.getenv('PARQUET_COMPRESSION', 'zstd'),
+        'export_csv': os.getenv('EXPORT_CSV', 'false').lower() == 'true'
+    }
+
+# Configuration de l'execution
+def get_processing_config():
+    """Retourne la configuration d'execution du pipeline"""
+    return {
+        'pipeline_mode': os.getenv('PIPELINE_MODE', 'batch'),
+        'queue_size': int(os.getenv('PIPELINE_QUEUE_SIZE', '4')),
+        'clean_chunksize': int(os.getenv('PIPELINE_CLEAN_CHUNKSIZE', '0')),
+        'workers': int(os.getenv('PIPELINE_WORKERS', '1')),
+        'parallel_chunksize': int(os.getenv('PIPELINE_PARALLEL_CHUNKSIZE', '50000')),
+        'csv_engine': os.getenv('PIPELINE_CSV_ENGINE', 'pyarrow').lower(),
+        'spill_rows': int(os.getenv('PIPELINE_SPILL_ROWS', '0'))
+    }
+
+# Configuration du cache HTTP
+def get_cache_config():
+    """Retourne la configuration du cache disque des reponses de l'API"""
+    return {
+        'mode': os.getenv('HTTP_CACHE_MODE', 'off'),
+        'directory': os.getenv('HTTP_CACHE_DIRECTORY', 'http_cache'),
+        'ttl': int(os.getenv('HTTP_CACHE_TTL', '86400')),
+        'max_megabytes': int(os.getenv('HTTP_CACHE_MAX_MB', '1024'))
+    }
+
+# Configuration de l'entrepot de donnees
+def get_warehouse_config():
+    """Retourne la configuration de l'entrepot de donnees"""
+    return {
+        'backend': os.getenv('WAREHOUSE_BACKEND', 'bigquery').lower(),
+        'sqlite_filename': os.getenv('WAREHOUSE_SQLITE_FILENAME', 'openfoodfacts.db')
     }
 
 # Configuration complète
@@ -77,6 +163,9 @@ def get_config():
         'google_cloud': get_google_cloud_config(),
         'api': get_api_config(),
         'files': get_file_config(),
+        'cache': get_cache_config(),
+        'processing': get_processing_config(),
+        'warehouse': get_warehouse_config(),
         'credentials_path': get_google_credentials_path()
     }
 
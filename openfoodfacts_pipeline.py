@@ -1,9 +1,37 @@
 import requests
+import numpy as np
 import pandas as pd
 import time
 import os
 import re
+import csv
+import sys
+import gzip
+import json
+import queue
+import random
+import io
+import codecs
+import hashlib
+import shutil
+import sqlite3
+import string
+import glob
+import tempfile
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from array import array
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from google.cloud import bigquery
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlencode
 
 # Import de la configuration
 try:
@@ -16,18 +44,69 @@ except ImportError:
         'google_cloud': {
             'project_id': 'project-final-laka-93110',
             'dataset_id': 'Laka10',
-            'table_id': 'openfoodfacts'
+            'table_id': 'openfoodfacts',
+            'load_format': 'csv',
+            'write_mode': 'truncate',
+            'soft_delete': False,
+            'staging_suffix': '_staging',
+            'transform_mode': 'pandas',
+            'transformed_table_id': '',
+            'use_bqstorage': False,
+            'partitioning': 'none',
+            'partition_overwrite': False,
+            'run_id': '',
+            'run_id_range': [19000, 29000, 1],
+            'clustering_fields': ['nutriscore_grade', 'brands', 'code']
         },
         'api': {
             'url': 'https://world.openfoodfacts.org',
             'page_size': 1000,
-            'num_pages': 20
+            'num_pages': 20,
+            'max_workers': 4,
+            'requests_per_second': 1,
+            'timeout': 10,
+            'max_retries': 5,
+            'backoff_factor': 0.5,
+            'retry_budget': 50,
+            'circuit_breaker_threshold': 5,
+            'circuit_breaker_cooldown': 60,
+            'stream_json': True,
+            'extraction_mode': 'full',
+            'delta_max_pages': 100,
+            'dump_path': '',
+            'dump_chunk_size': 50000,
+            'extra_fields': []
         },
         'files': {
             'data_directory': 'data',
             'csv_original_filename': 'openfood_referentiel.csv',
             'csv_cleaned_filename': 'openfood_referentiel_cleaned.csv',
-            'csv_transformed_filename': 'openfood_transformed.csv'
+            'csv_transformed_filename': 'openfood_transformed.csv',
+            'checkpoint_directory': 'checkpoints',
+            'delta_state_filename': 'delta_state.json',
+            'dictionary_directory': os.path.join('config', 'dictionaries'),
+            'storage_format': 'csv',
+            'parquet_compression': 'zstd',
+            'export_csv': False
+        },
+        'cache': {
+            'mode': 'off',
+            'directory': 'http_cache',
+            'ttl': 86400,
+            'max_megabytes': 1024
+        },
+        'processing': {
+            'pipeline_mode': 'batch',
+            'queue_size': 4,
+            'clean_chunksize': 0,
+            'workers': 1,
+            'parallel_chunksize': 50000,
+            'csv_engine': 'pyarrow',
+            'spill_rows': 0
+        },
+        'warehouse': {
+            'backend': 'bigquery',
+            'sqlite_filename': 'openfoodfacts.db'
         },
         'credentials_path': None
     }
@@ -36,12 +115,16 @@ except ImportError:
 DATA_DIR = config['files']['data_directory']
 PAGE_SIZE = config['api']['page_size']
 NUM_PAGES = config['api']['num_pages']
+MAX_WORKERS = config['api']['max_workers']
+REQUESTS_PER_SECOND = config['api']['requests_per_second']
 
 # Configuration BigQuery
 PROJECT_ID = config['google_cloud']['project_id']
 DATASET_ID = config['google_cloud']['dataset_id']
 TABLE_ID = config['google_cloud']['table_id']
 BQ_TABLE = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+TRANSFORMED_TABLE_ID = config['google_cloud'].get('transformed_table_id') or TABLE_ID + '_transformed'
+BQ_TRANSFORMED_TABLE = f"{PROJECT_ID}.{DATASET_ID}.{TRANSFORMED_TABLE_ID}"
 
 # Création du dossier data s'il n'existe pas
 if not os.path.exists(DATA_DIR):
@@ -80,10 +163,318 @@ def get_csv_path(filename):
     """Retourne le chemin complet pour un fichier CSV dans le dossier data"""
     return os.path.join(DATA_DIR, filename)
 
+STAGE_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet"}
+
+def get_stage_path(filename, storage_format=None):
+    """Retourne le chemin d'un fichier d'etape dans le format de stockage configure"""
+    if storage_format is None:
+        storage_format = config['files'].get('storage_format', 'csv')
+    if storage_format not in STAGE_EXTENSIONS:
+        raise ValueError(f"Format de stockage inconnu : {storage_format}")
+    return os.path.splitext(get_csv_path(filename))[0] + STAGE_EXTENSIONS[storage_format]
+
+def is_parquet_path(path):
+    """Indique si un fichier d'etape est au format Parquet"""
+    return path.endswith(STAGE_EXTENSIONS["parquet"])
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Le disjoncteur est ouvert : l'API est consideree comme indisponible"""
+
+class RetryBudgetExceeded(requests.exceptions.RequestException):
+    """Le budget de retries de l'execution est epuise"""
+
+class CacheMissError(requests.exceptions.RequestException):
+    """Reponse absente du cache en mode hors ligne"""
+
+class CachedBody(io.BufferedReader):
+    """Corps de reponse lu depuis le cache disque"""
+
+    def release_conn(self):
+        self.close()
+
+class HttpCache:
+    """Cache disque des reponses HTTP, adresse par le contenu de l'URL et des parametres"""
+
+    STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+    def __init__(self, directory, ttl=86400, max_bytes=1024 * 1024 * 1024, mode="on"):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, url, params=None):
+        """Cle du cache : empreinte de l'URL et des parametres tries"""
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        folder = os.path.join(self.directory, key[:2])
+        return os.path.join(folder, key + ".body"), os.path.join(folder, key + ".json")
+
+    def lookup(self, key):
+        """Retourne les metadonnees de l'entree ou None"""
+        body_path, meta_path = self._paths(key)
+        if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, meta):
+        return time.time() - meta.get("stored_at", 0) < self.ttl
+
+    def validators(self, meta):
+        """En-tetes de revalidation conditionnelle"""
+        headers = {}
+        if meta.get("headers", {}).get("ETag"):
+            headers["If-None-Match"] = meta["headers"]["ETag"]
+        if meta.get("headers", {}).get("Last-Modified"):
+            headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+        return headers
+
+    def _write_meta(self, key, meta):
+        _, meta_path = self._paths(key)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(meta_path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def refresh(self, key, meta):
+        """Prolonge une entree revalidee par un 304"""
+        meta["stored_at"] = time.time()
+        self._write_meta(key, meta)
+
+    def store(self, key, response):
+        """Ecrit le corps de la reponse sur disque par morceaux"""
+        body_path, _ = self._paths(key)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(body_path), suffix=".tmp")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f, response:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, body_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        meta = {
+            "url": response.url,
+            "stored_at": time.time(),
+            "size": size,
+            "headers": {h: response.headers[h] for h in self.STORED_HEADERS if h in response.headers},
+        }
+        self._write_meta(key, meta)
+        self.evict()
+        return meta
+
+    def response(self, key, meta):
+        """Construit une reponse requests lue depuis le disque"""
+        body_path, _ = self._paths(key)
+        # La date de modification du corps sert d'horodatage LRU
+        os.utime(body_path)
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = meta.get("url")
+        response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+        response.encoding = "utf-8"
+        response.raw = CachedBody(io.FileIO(body_path, "rb"))
+        return response
+
+    def evict(self):
+        """Supprime les entrees les moins recemment utilisees au-dela de la taille maximale"""
+        with self.lock:
+            entries = []
+            total = 0
+            for folder, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".body"):
+                        path = os.path.join(folder, name)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, path))
+                        total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for victim in (path, path[:-len(".body")] + ".json"):
+                    if os.path.exists(victim):
+                        os.remove(victim)
+                total -= size
+
+class OpenFoodFactsClient:
+    """Client HTTP partage : pool de connexions keep-alive, retries et disjoncteur"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, timeout=10, max_retries=5, backoff_factor=0.5, max_backoff=30,
+                 retry_budget=50, breaker_threshold=5, breaker_cooldown=60, pool_size=10, cache=None,
+                 requests_per_second=None):
+        self.timeout = timeout
+        self.cache = cache
+        # Seules les requetes envoyees sur le reseau consomment un jeton : le cache n'est pas limite
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retries_left = retry_budget
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "User-Agent": "OpenFoodFactsPipeline/1.0",
+        })
+
+    def _check_circuit(self):
+        """Refuse la requete tant que le disjoncteur est ouvert"""
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.breaker_cooldown:
+                raise CircuitOpenError("Disjoncteur ouvert : trop d'echecs consecutifs sur l'API")
+            # Demi-ouverture : on laisse passer une requete d'essai
+            self.opened_at = None
+            self.consecutive_failures = self.breaker_threshold - 1
+
+    def _record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def _record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.breaker_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                print(f"Disjoncteur ouvert pour {self.breaker_cooldown}s apres {self.consecutive_failures} echecs")
+
+    def _consume_retry(self):
+        with self.lock:
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+    def _backoff_delay(self, attempt, response=None):
+        """Backoff exponentiel avec jitter complet, borne par Retry-After si fourni"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, min(self.max_backoff, int(retry_after)))
+        return delay
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        """Effectue un GET en passant par le cache disque s'il est actif"""
+        if self.cache is None or self.cache.mode == "off":
+            return self._get_with_retries(url, params, timeout, **kwargs)
+
+        key = self.cache.key(url, params)
+        meta = self.cache.lookup(key)
+        if meta is not None and (self.cache.mode == "offline" or self.cache.is_fresh(meta)):
+            return self.cache.response(key, meta)
+        if self.cache.mode == "offline":
+            raise CacheMissError(f"Reponse absente du cache (mode hors ligne) : {url}")
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta is not None:
+            headers.update(self.cache.validators(meta))
+        kwargs["stream"] = True
+        response = self._get_with_retries(url, params, timeout, headers=headers, **kwargs)
+        if meta is not None and response.status_code == 304:
+            response.close()
+            self.cache.refresh(key, meta)
+            return self.cache.response(key, meta)
+        meta = self.cache.store(key, response)
+        return self.cache.response(key, meta)
+
+    def _get_with_retries(self, url, params=None, timeout=None, **kwargs):
+        """Effectue un GET avec retries sur erreurs 5xx/429/timeouts"""
+        attempt = 0
+        while True:
+            self._check_circuit()
+            self.rate_limiter.acquire()
+            response = None
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+                if response.status_code not in self.RETRY_STATUSES:
+                    self._record_success()
+                    response.raise_for_status()
+                    return response
+                error = requests.exceptions.HTTPError(f"HTTP {response.status_code} pour {response.url}", response=response)
+                response.close()
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                error = e
+
+            self._record_failure()
+            if attempt >= self.max_retries:
+                raise error
+            if not self._consume_retry():
+                raise RetryBudgetExceeded(f"Budget de retries epuise ({error})")
+            delay = self._backoff_delay(attempt, response)
+            print(f"Nouvel essai dans {delay:.1f}s ({attempt + 1}/{self.max_retries}) : {error}")
+            time.sleep(delay)
+            attempt += 1
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_cache():
+    """Construit le cache HTTP selon la configuration (None s'il est desactive)"""
+    cache_config = config.get('cache', {})
+    mode = cache_config.get('mode', 'off')
+    if mode == 'off':
+        return None
+    directory = os.path.join(DATA_DIR, cache_config.get('directory', 'http_cache'))
+    print(f"Cache HTTP actif (mode {mode}) : {directory}")
+    return HttpCache(
+        directory,
+        ttl=cache_config.get('ttl', 86400),
+        max_bytes=cache_config.get('max_megabytes', 1024) * 1024 * 1024,
+        mode=mode,
+    )
+
+def get_http_client():
+    """Retourne le client HTTP partage par toute l'extraction"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            api = config['api']
+            _http_client = OpenFoodFactsClient(
+                timeout=api['timeout'],
+                max_retries=api['max_retries'],
+                backoff_factor=api['backoff_factor'],
+                retry_budget=api['retry_budget'],
+                breaker_threshold=api['circuit_breaker_threshold'],
+                breaker_cooldown=api['circuit_breaker_cooldown'],
+                pool_size=max(10, MAX_WORKERS),
+                cache=get_http_cache(),
+                requests_per_second=REQUESTS_PER_SECOND,
+            )
+        return _http_client
+
 def check_api_connection():
     """Verifie la connexion a l'API OpenFoodFacts"""
     try:
-        response = requests.get(config['api']['url'], timeout=5)
+        response = get_http_client().get(config['api']['url'], timeout=5)
         if response.status_code == 200:
             print("Connexion a l'API OpenFoodFacts etablie")
             return True
@@ -91,49 +482,481 @@ def check_api_connection():
         print(f"Echec de connexion a l'API : {e}")
     return False
 
-def fetch_products(page, page_size=None):
-    """Recupere les produits d'une page donnee"""
-    if page_size is None:
-        page_size = PAGE_SIZE
-    
-    url = f"{config['api']['url']}/cgi/search.pl"
+def get_search_params(page, page_size, sort_by=None, extra_fields=()):
+    """Construit les parametres de la requete search.pl"""
     params = {
         "action": "process",
         "page_size": page_size,
         "page": page,
         "json": True,
+        # Seuls les champs utilises par l'extraction sont demandes a l'API
+        "fields": get_api_fields(extra=extra_fields),
     }
+    if sort_by:
+        params["sort_by"] = sort_by
+    return params
+
+def fetch_products(page, page_size=None, sort_by=None, extra_fields=()):
+    """Recupere les produits d'une page donnee (None si la page n'a pas pu etre telechargee)"""
+    if page_size is None:
+        page_size = PAGE_SIZE
+    
+    url = f"{config['api']['url']}/cgi/search.pl"
+    params = get_search_params(page, page_size, sort_by, extra_fields)
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
+        response = get_http_client().get(url, params=params)
         return response.json().get("products", [])
     except requests.exceptions.RequestException as e:
         print(f"Erreur HTTP page {page} : {e}")
     except ValueError as e:
         print(f"Erreur JSON page {page} : {e}")
-    return []
+    return None
 
-def extract_product_info(product):
-    """Extrait les informations d'un produit"""
-    return {
-        "product_name": product.get("product_name", ""),
-        "brands": product.get("brands", ""),
-        "stores": product.get("stores", ""),
-        "nutriscore_grade": product.get("nutriscore_grade", ""),
-        "nutrition_score_fr": product.get("nutrition_score_fr", ""),
-        "energy_kcal": product.get("nutriments", {}).get("energy-kcal_100g"),
-        "fat_100g": product.get("nutriments", {}).get("fat_100g"),
-        "saturated_fat_100g": product.get("nutriments", {}).get("saturated-fat_100g"),
-        "sugars_100g": product.get("nutriments", {}).get("sugars_100g"),
-        "salt_100g": product.get("nutriments", {}).get("salt_100g"),
-        "fiber_100g": product.get("nutriments", {}).get("fiber_100g"),
-        "proteins_100g": product.get("nutriments", {}).get("proteins_100g"),
-        "labels": product.get("labels", ""),
-        "origins": product.get("origins", ""),
-        "categories": product.get("categories", ""),
-        "url": product.get("url", ""),
-        "code": product.get("code", ""),
-    }
+JSON_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+def iter_json_array_items(chunks, array_key="products"):
+    """Decode un objet JSON recu par morceaux et produit un a un les elements du tableau array_key"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    state = {"buf": "", "pos": 0, "eof": False}
+
+    def read_more():
+        if state["eof"]:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            state["eof"] = True
+            data = text_decoder.decode(b"", final=True)
+        else:
+            data = text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        # On ne garde que la partie non consommee du tampon
+        state["buf"] = state["buf"][state["pos"]:] + data
+        state["pos"] = 0
+        return True
+
+    def peek():
+        while True:
+            buf, pos = state["buf"], state["pos"]
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            state["pos"] = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not read_more():
+                raise ValueError("Flux JSON tronque")
+
+    def expect(char):
+        if peek() != char:
+            raise ValueError(f"JSON inattendu : '{char}' attendu a la position {state['pos']}")
+        state["pos"] += 1
+
+    def decode_value():
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(state["buf"], state["pos"])
+                # Un nombre suivi seulement de caracteres de nombre ("2." ou "1e") peut encore etre incomplet
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if state["eof"] or not (is_number and all(c in JSON_NUMBER_CHARS for c in state["buf"][end:])):
+                    state["pos"] = end
+                    return value
+            except json.JSONDecodeError:
+                if state["eof"]:
+                    raise
+            read_more()
+
+    expect("{")
+    while True:
+        char = peek()
+        if char == "}":
+            return
+        if char == ",":
+            state["pos"] += 1
+            continue
+        key = decode_value()
+        expect(":")
+        if key != array_key:
+            decode_value()
+            continue
+        expect("[")
+        while True:
+            char = peek()
+            if char == "]":
+                state["pos"] += 1
+                break
+            if char == ",":
+                state["pos"] += 1
+                continue
+            yield decode_value()
+
+def fetch_product_rows(page, page_size=None, sort_by=None, extra_fields=()):
+    """Recupere une page en flux et retourne directement les lignes extraites (None en cas d'echec)"""
+    if page_size is None:
+        page_size = PAGE_SIZE
+
+    url = f"{config['api']['url']}/cgi/search.pl"
+    params = get_search_params(page, page_size, sort_by, extra_fields)
+    try:
+        response = get_http_client().get(url, params=params, stream=True)
+        with response:
+            rows = []
+            for product in iter_json_array_items(response.iter_content(chunk_size=64 * 1024)):
+                row = extract_product_info(product)
+                for field in extra_fields:
+                    row[field] = product.get(field)
+                rows.append(row)
+            return rows
+    except requests.exceptions.RequestException as e:
+        print(f"Erreur HTTP page {page} : {e}")
+    except ValueError as e:
+        print(f"Erreur JSON page {page} : {e}")
+    return None
+
+class TokenBucket:
+    """Limiteur de debit a jetons partage entre les threads de telechargement"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme"""
+        if not self.rate or self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def fetch_pages(pages, page_size=None, max_workers=None, fetch_page=None):
+    """Telecharge plusieurs pages en parallele et les renvoie dans l'ordre des pages.
+    Le debit est limite par le client HTTP partage, sur les seules requetes reseau"""
+    if fetch_page is None:
+        fetch_page = fetch_products
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    max_workers = max(1, max_workers)
+
+    def fetch(page):
+        return fetch_page(page, page_size)
+
+    pages = iter(pages)
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Garder au plus max_workers pages en cours de telechargement
+        for page in pages:
+            in_flight.append((page, executor.submit(fetch, page)))
+            if len(in_flight) >= max_workers:
+                break
+        while in_flight:
+            page, future = in_flight.popleft()
+            products = future.result()
+            next_page = next(pages, None)
+            if next_page is not None:
+                in_flight.append((next_page, executor.submit(fetch, next_page)))
+            yield page, products
+
+# Specification des colonnes extraites : nom de colonne, chemin dans le produit, type
+PRODUCT_FIELDS = [
+    ("product_name", "product_name", "str"),
+    ("brands", "brands", "str"),
+    ("stores", "stores", "str"),
+    ("nutriscore_grade", "nutriscore_grade", "str"),
+    ("nutrition_score_fr", "nutrition_score_fr", "float"),
+    ("energy_kcal", "nutriments.energy-kcal_100g", "float"),
+    ("fat_100g", "nutriments.fat_100g", "float"),
+    ("saturated_fat_100g", "nutriments.saturated-fat_100g", "float"),
+    ("sugars_100g", "nutriments.sugars_100g", "float"),
+    ("salt_100g", "nutriments.salt_100g", "float"),
+    ("fiber_100g", "nutriments.fiber_100g", "float"),
+    ("proteins_100g", "nutriments.proteins_100g", "float"),
+    ("labels", "labels", "str"),
+    ("origins", "origins", "str"),
+    ("categories", "categories", "str"),
+    ("url", "url", "str"),
+    ("code", "code", "str"),
+]
+
+EXTRACTION_FIELDS = PRODUCT_FIELDS + [
+    field for field in config['api'].get('extra_fields', [])
+    if field[0] not in {name for name, _, _ in PRODUCT_FIELDS}
+]
+NUMERIC_COLUMNS = [name for name, _, field_type in EXTRACTION_FIELDS if field_type == "float"]
+# Colonnes textuelles tres repetitives : traitees une fois par valeur distincte et stockees en category
+CATEGORICAL_COLUMNS = ["brands", "stores", "origins", "labels", "categories", "nutriscore_grade"]
+# Schema commun des fichiers de produits : code en texte (zeros initiaux conserves),
+# nutriments en float32 et colonnes repetitives en category
+PRODUCT_DTYPES = {
+    name: "category" if name in CATEGORICAL_COLUMNS else "float32" if field_type == "float" else str
+    for name, _, field_type in EXTRACTION_FIELDS
+}
+# A la lecture, les nutriments restent en texte : une valeur non numerique devient NaN
+# (coerce_numeric_columns) au lieu de faire echouer la lecture de tout le fichier
+CSV_READ_DTYPES = {name: str if dtype == "float32" else dtype for name, dtype in PRODUCT_DTYPES.items()}
+ARROW_CSV_TYPES = {
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    str: pa.string(),
+}
+ARROW_PRODUCT_TYPES = {**ARROW_CSV_TYPES, "float32": pa.float32()}
+
+def get_api_fields(fields=None, extra=()):
+    """Retourne la projection fields= a envoyer a l'API (champs de premier niveau)"""
+    if fields is None:
+        fields = EXTRACTION_FIELDS
+    top_level = []
+    for _, source, _ in fields:
+        root = source.split(".")[0]
+        if root not in top_level:
+            top_level.append(root)
+    for root in extra:
+        if root not in top_level:
+            top_level.append(root)
+    return ",".join(top_level)
+
+def _field_reads(fields):
+    """Prepare la lecture des champs d'un produit. Les objets lus sont numerotes : 0 pour le produit,
+    puis chaque sous-objet distinct (objet parent, cle). Chaque champ devient (nom, objet, cle, defaut)"""
+    parents = {}
+    parent_reads = []
+    reads = []
+    for name, source, field_type in fields:
+        *path, key = source.split(".")
+        parent = 0
+        for depth in range(1, len(path) + 1):
+            prefix = tuple(path[:depth])
+            if prefix not in parents:
+                parent_reads.append((parent, prefix[-1]))
+                parents[prefix] = len(parent_reads)
+            parent = parents[prefix]
+        reads.append((name, parent, key, "" if field_type == "str" else None))
+    return tuple(parent_reads), tuple(reads)
+
+_EMPTY_OBJECT = {}
+
+def _object_getters(product, parent_reads):
+    """Retourne la methode get du produit puis de chaque sous-objet, lu une seule fois par produit"""
+    getters = [product.get]
+    for parent, key in parent_reads:
+        obj = getters[parent](key) or _EMPTY_OBJECT
+        getters.append(obj.get if isinstance(obj, dict) else _EMPTY_OBJECT.get)
+    return getters
+
+def build_extractor(fields):
+    """Construit la fonction d'extraction d'un produit a partir de la specification des colonnes"""
+    parent_reads, reads = _field_reads(fields)
+
+    def extract(product):
+        getters = _object_getters(product, parent_reads)
+        row = {}
+        for name, parent, key, default in reads:
+            row[name] = getters[parent](key, default)
+        return row
+    return extract
+
+def _to_float(value):
+    """Convertit une valeur en float (NaN si elle n'est pas numerique), comme pd.to_numeric"""
+    if value is None:
+        return float("nan")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+def _intern_text(value):
+    """Partage une seule instance par chaine identique"""
+    return sys.intern(value) if value.__class__ is str else value
+
+def build_appender(fields):
+    """Construit une fonction qui ajoute un produit directement dans des colonnes, sans dictionnaire par ligne"""
+    parent_reads, reads = _field_reads(fields)
+    converters = [_to_float if field_type == "float" else _intern_text for _, _, field_type in fields]
+
+    def bind(appenders):
+        targets = tuple(
+            (append_value, convert, parent, key, default)
+            for append_value, convert, (_, parent, key, default) in zip(appenders, converters, reads)
+        )
+
+        def append(product):
+            getters = _object_getters(product, parent_reads)
+            for append_value, convert, parent, key, default in targets:
+                append_value(convert(getters[parent](key, default)))
+        return append
+    return bind
+
+extract_product_info = build_extractor(EXTRACTION_FIELDS)
+extract_product_info.__name__ = "extract_product_info"
+extract_product_info.__doc__ = "Extrait les informations d'un produit"
+
+class ProductAccumulator:
+    """Accumule les produits colonne par colonne (tableaux types, chaines partagees)
+    et deverse les lignes sur disque en Parquet au-dela d'un seuil"""
+
+    def __init__(self, fields=None, spill_rows=None):
+        self.fields = list(EXTRACTION_FIELDS if fields is None else fields)
+        if spill_rows is None:
+            spill_rows = config['processing'].get('spill_rows', 0)
+        self.spill_rows = spill_rows
+        self.spill_dir = None
+        self.spilled = []
+        self.spilled_count = 0
+        self._bind_product = build_appender(self.fields)
+        # Les lignes deja extraites (checkpoint) sont lues par nom de colonne
+        self._bind_row = build_appender([(name, name, field_type) for name, _, field_type in self.fields])
+        self._reset()
+
+    def _reset(self):
+        self.columns = [array("f") if field_type == "float" else [] for _, _, field_type in self.fields]
+        appenders = [column.append for column in self.columns]
+        self._append_product = self._bind_product(appenders)
+        self._append_row = self._bind_row(appenders)
+        self.size = 0
+
+    def __len__(self):
+        return self.spilled_count + self.size
+
+    def append(self, product):
+        """Ajoute un produit au format de l'API"""
+        self._append_product(product)
+        self.size += 1
+        if self.spill_rows and self.size >= self.spill_rows:
+            self.spill()
+
+    def append_row(self, row):
+        """Ajoute une ligne deja extraite (dictionnaire indexe par nom de colonne)"""
+        self._append_row(row)
+        self.size += 1
+        if self.spill_rows and self.size >= self.spill_rows:
+            self.spill()
+
+    def _current_table(self):
+        arrays = []
+        for (_, _, field_type), column in zip(self.fields, self.columns):
+            if field_type == "float":
+                arrays.append(pa.array(np.frombuffer(column, dtype=np.float32), from_pandas=True))
+                continue
+            try:
+                arrays.append(pa.array(column, type=pa.string()))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Valeurs non textuelles : meme conversion que clean_text
+                arrays.append(pa.array([v if v is None or v.__class__ is str else str(v) for v in column],
+                                       type=pa.string()))
+        return pa.Table.from_arrays(arrays, names=[name for name, _, _ in self.fields])
+
+    def spill(self):
+        """Ecrit les lignes en memoire dans un fichier Parquet temporaire"""
+        if not self.size:
+            return
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="openfoodfacts_rows_")
+        path = os.path.join(self.spill_dir, f"part_{len(self.spilled):05d}.parquet")
+        pq.write_table(self._current_table(), path)
+        self.spilled.append(path)
+        self.spilled_count += self.size
+        print(f"{len(self)} produits accumules, deverses sur disque : {path}")
+        self._reset()
+
+    def to_arrow(self):
+        """Retourne toutes les lignes sous forme de table Arrow"""
+        tables = [pq.read_table(path) for path in self.spilled]
+        if self.size or not tables:
+            tables.append(self._current_table())
+        return pa.concat_tables(tables)
+
+    def to_frame(self):
+        """Retourne toutes les lignes sous forme de DataFrame"""
+        if self.spilled:
+            return self.to_arrow().to_pandas()
+        data = {}
+        for (name, _, field_type), column in zip(self.fields, self.columns):
+            if field_type == "float":
+                data[name] = np.array(column, dtype=np.float32)
+            else:
+                data[name] = pd.Series(column, dtype=object)
+        return pd.DataFrame(data)
+
+    def clear(self):
+        """Vide l'accumulateur et supprime les fichiers deverses"""
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self.spill_dir = None
+        self.spilled = []
+        self.spilled_count = 0
+        self._reset()
+
+def get_checkpoint_dir(page_size=None):
+    """Retourne le dossier de checkpoint propre a l'URL de l'API et a la taille de page"""
+    if page_size is None:
+        page_size = PAGE_SIZE
+    run_key = f"{config['api']['url']}|{page_size}|{get_api_fields()}"
+    run_key = hashlib.sha1(run_key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(DATA_DIR, config['files']['checkpoint_directory'], f"search_{run_key}")
+
+def load_checkpoint(checkpoint_dir):
+    """Lit le journal et retourne les pages terminees avec leur segment"""
+    completed = {}
+    journal_path = os.path.join(checkpoint_dir, "journal.log")
+    if not os.path.exists(journal_path):
+        return completed
+
+    with open(journal_path, "r", encoding="utf-8") as journal:
+        for line in journal:
+            parts = line.rstrip("\n").split("\t")
+            # Une ligne tronquee (arret brutal pendant l'ecriture) est ignoree
+            if len(parts) != 3 or not parts[0].isdigit():
+                continue
+            segment_path = os.path.join(checkpoint_dir, parts[1])
+            if os.path.exists(segment_path):
+                completed[int(parts[0])] = segment_path
+    return completed
+
+def write_checkpoint_page(checkpoint_dir, page, rows):
+    """Ecrit le segment d'une page puis l'enregistre dans le journal"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    segment_name = f"page_{page:05d}.jsonl"
+    segment_path = os.path.join(checkpoint_dir, segment_name)
+
+    # Le segment est ecrit a part puis renomme : il n'est jamais visible a moitie ecrit
+    tmp_path = segment_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as segment:
+        for row in rows:
+            segment.write(json.dumps(row, ensure_ascii=False) + "\n")
+        segment.flush()
+        os.fsync(segment.fileno())
+    os.replace(tmp_path, segment_path)
+
+    with open(os.path.join(checkpoint_dir, "journal.log"), "a", encoding="utf-8") as journal:
+        journal.write(f"{page}\t{segment_name}\t{len(rows)}\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+    return segment_path
+
+def read_checkpoint_rows(completed, accumulator=None):
+    """Fusionne les segments du checkpoint dans l'ordre des pages, directement en colonnes"""
+    if accumulator is None:
+        accumulator = ProductAccumulator()
+    for page in sorted(completed):
+        with open(completed[page], "r", encoding="utf-8") as segment:
+            for line in segment:
+                if line.strip():
+                    accumulator.append_row(json.loads(line))
+    return accumulator
+
+def clear_checkpoint(checkpoint_dir):
+    """Supprime le checkpoint une fois l'extraction sauvegardee"""
+    if os.path.exists(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir)
+        print(f"Checkpoint supprime : {checkpoint_dir}")
 
 def clean_text(text):
     """Nettoie le texte pour eviter les problemes de CSV"""
@@ -155,6 +978,47 @@ def clean_text(text):
     
     return text
 
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+
+def clean_text_series(series):
+    """Applique clean_text a une colonne entiere en une seule passe"""
+    missing = series.isna().to_numpy()
+    remove_control_chars = CONTROL_CHARS_RE.sub
+    # split()/join() equivaut a re.sub(r'\s+', ' ', text).strip()
+    cleaned = pd.Series(
+        [" ".join(remove_control_chars("", str(text)).replace('"', "'").split()) for text in series.to_numpy()],
+        index=series.index, dtype=object,
+    )
+
+    # Limiter la longueur
+    too_long = cleaned.str.len().to_numpy() > 1000
+    if too_long.any():
+        cleaned[too_long] = cleaned[too_long].str[:1000] + "..."
+
+    cleaned[missing] = ""
+    return cleaned
+
+def apply_unique(series, func, vectorized=False, as_category=True):
+    """Applique func une seule fois par valeur distincte puis diffuse le resultat via les codes"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    uniques = pd.Series(uniques, dtype=object)
+    if vectorized:
+        results = func(uniques).to_numpy(dtype=object)
+    else:
+        results = [func(value) for value in uniques]
+
+    result_codes, categories = pd.factorize(pd.Series(results, dtype=object))
+    values = pd.Categorical.from_codes(result_codes[codes], categories=categories)
+    if not as_category:
+        values = values.astype(object)
+    return pd.Series(values, index=series.index, name=series.name)
+
+def clean_text_column(series, col):
+    """Nettoie une colonne textuelle, par valeur distincte pour les colonnes repetitives"""
+    if col in CATEGORICAL_COLUMNS:
+        return apply_unique(series, clean_text_series, vectorized=True)
+    return clean_text_series(series)
+
 def clean_column_name(col):
     """Nettoie les noms de colonnes"""
     col = col.strip()
@@ -162,66 +1026,406 @@ def clean_column_name(col):
     col = re.sub(r"__+", "_", col)
     return col.strip("_")
 
+# Dictionnaire de traduction de l'anglais vers le francais
+TRANSLATIONS = {
+    "organic": "bio",
+    "gluten-free": "sans gluten",
+    "vegetarian": "vegetarien",
+    "vegan": "vegetalien",
+    "non-gmo": "sans OGM",
+    "halal": "halal",
+    "kosher": "kasher",
+    "beverages": "boissons",
+    "dairies": "produits laitiers",
+    "sodas": "sodas",
+    "snacks": "snacks",
+    "cereals": "cereales",
+    "meats": "viandes",
+    "ready-meals": "plats prepares",
+    "breakfasts": "petits-dejeuners",
+    "cheeses": "fromages",
+    "desserts": "desserts",
+    "france": "France",
+    "germany": "Allemagne",
+    "italy": "Italie",
+    "spain": "Espagne",
+    "carrefour": "Carrefour",
+    "leclerc": "Leclerc",
+    "lidl": "Lidl",
+    "auchan": "Auchan",
+    "monoprix": "Monoprix"
+}
+
+# Dictionnaire de translitteration de l'arabe vers le francais
+ARABIC_TO_FRENCH = {
+    "سلطان": "Sultan",
+    "الراية": "Al-Raya",
+    "كارفور": "Carrefour",
+    "أوشان": "Auchan",
+    "ليدل": "Lidl"
+}
+
+class TextRewriter:
+    """Remplace tous les termes d'un dictionnaire en une seule passe par chaine"""
+
+    def __init__(self, replacements, ignore_case=True, cache_size=65536):
+        self.ignore_case = ignore_case
+        self.replacements = {(term.lower() if ignore_case else term): value
+                             for term, value in replacements.items()}
+        # Les termes les plus longs d'abord pour que l'alternance prenne la plus longue correspondance
+        terms = sorted(replacements, key=len, reverse=True)
+        self.pattern = None
+        if terms:
+            alternation = "|".join(re.escape(term) for term in terms)
+            self.pattern = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE if ignore_case else 0)
+        self.rewrite = lru_cache(maxsize=cache_size)(self._rewrite)
+
+    def _replace(self, match):
+        term = match.group(0)
+        return self.replacements.get(term.lower() if self.ignore_case else term, term)
+
+    def _rewrite(self, text):
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+def load_dictionary_files(directory=None):
+    """Charge les dictionnaires supplementaires (lignes terme = traduction) du dossier config"""
+    if directory is None:
+        directory = config['files'].get('dictionary_directory', '')
+    entries = {}
+    if not directory or not os.path.isdir(directory):
+        return entries
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                term, _, value = line.partition("=")
+                if term.strip():
+                    entries[term.strip()] = value.strip()
+        print(f"Dictionnaire charge : {path}")
+    return entries
+
+TRANSLATION_REWRITER = TextRewriter({**TRANSLATIONS, **load_dictionary_files()})
+TRANSLITERATION_REWRITER = TextRewriter(ARABIC_TO_FRENCH, ignore_case=False)
+# Traduction et translitteration combinees : les termes arabes n'ont pas de casse
+TEXT_REWRITER = TextRewriter({**TRANSLATION_REWRITER.replacements, **ARABIC_TO_FRENCH})
+
 def translate_text(text):
     """Traduit le texte de l'anglais vers le francais"""
-    translations = {
-        "organic": "bio",
-        "gluten-free": "sans gluten",
-        "vegetarian": "vegetarien",
-        "vegan": "vegetalien",
-        "non-gmo": "sans OGM",
-        "halal": "halal",
-        "kosher": "kasher",
-        "beverages": "boissons",
-        "dairies": "produits laitiers",
-        "sodas": "sodas",
-        "snacks": "snacks",
-        "cereals": "cereales",
-        "meats": "viandes",
-        "ready-meals": "plats prepares",
-        "breakfasts": "petits-dejeuners",
-        "cheeses": "fromages",
-        "desserts": "desserts",
-        "france": "France",
-        "germany": "Allemagne",
-        "italy": "Italie",
-        "spain": "Espagne",
-        "carrefour": "Carrefour",
-        "leclerc": "Leclerc",
-        "lidl": "Lidl",
-        "auchan": "Auchan",
-        "monoprix": "Monoprix"
-    }
-    
-    for eng, fr in translations.items():
-        text = re.sub(rf"\b{eng}\b", fr, text, flags=re.IGNORECASE)
-    return text
+    return TRANSLATION_REWRITER.rewrite(text)
 
 def transliterate_text(text):
     """Translitere le texte arabe vers le francais"""
-    arabic_to_french = {
-        "سلطان": "Sultan",
-        "الراية": "Al-Raya",
-        "كارفور": "Carrefour",
-        "أوشان": "Auchan",
-        "ليدل": "Lidl"
-    }
-    
-    for ar, fr in arabic_to_french.items():
-        text = re.sub(rf"\b{ar}\b", fr, text)
-    return text
+    return TRANSLITERATION_REWRITER.rewrite(text)
+
+def rewrite_text(text):
+    """Traduit et translitere le texte en une seule passe"""
+    return TEXT_REWRITER.rewrite(text)
+
+NUTRISCORE_CLASSIFICATIONS = {
+    "A": "Excellent",
+    "B": "Bon",
+    "C": "Moyen",
+    "D": "Mediocre",
+    "E": "Mauvais"
+}
 
 def classify_nutriscore(score):
     """Classifie le nutriscore"""
     score = str(score).strip().upper()
-    classifications = {
-        "A": "Excellent",
-        "B": "Bon",
-        "C": "Moyen",
-        "D": "Mediocre",
-        "E": "Mauvais"
-    }
-    return classifications.get(score, "Inconnu")
+    return NUTRISCORE_CLASSIFICATIONS.get(score, "Inconnu")
+
+NUTRISCORE_GRADES = list(NUTRISCORE_CLASSIFICATIONS)
+# Seuils des points Nutri-Score (aliments solides) : un point par seuil strictement depasse.
+# Chaque entree : colonne source, facteur de conversion, seuils
+NUTRISCORE_NEGATIVE_POINTS = [
+    # kcal -> kJ
+    ("energy_kcal", 4.184, [335, 670, 1005, 1340, 1675, 2010, 2345, 2680, 3015, 3350]),
+    ("sugars_100g", 1, [4.5, 9, 13.5, 18, 22.5, 27, 31, 36, 40, 45]),
+    ("saturated_fat_100g", 1, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+    # sel (g) -> sodium (mg)
+    ("salt_100g", 400, [90, 180, 270, 360, 450, 540, 630, 720, 810, 900]),
+]
+NUTRISCORE_FIBER_POINTS = ("fiber_100g", 1, [0.9, 1.9, 2.8, 3.7, 4.7])
+NUTRISCORE_PROTEIN_POINTS = ("proteins_100g", 1, [1.6, 3.2, 4.8, 6.4, 8.0])
+# Au-dela de ce total de points negatifs, les proteines ne sont plus comptees
+NUTRISCORE_PROTEIN_CAP = 11
+# Score maximal de chaque lettre : A <= -1, B <= 2, C <= 10, D <= 18, E au-dela
+NUTRISCORE_GRADE_BOUNDS = [-1, 2, 10, 18]
+# Fibres souvent absentes : comptees comme nulles, les autres nutriments sont requis
+NUTRISCORE_OPTIONAL_COLUMNS = ["fiber_100g"]
+
+def _nutriment_values(df, col, factor):
+    """Valeurs converties d'un nutriment, arrondies pour que 3.7 en float32 ne depasse pas le seuil 3.7"""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.round(values * factor, 3)
+
+def _nutriscore_points(values, thresholds):
+    """Nombre de seuils strictement depasses par chaque valeur"""
+    return np.searchsorted(np.asarray(thresholds, dtype=np.float64), values, side='left').astype(np.int16)
+
+def compute_nutriscore(df):
+    """Calcule le score et la lettre Nutri-Score a partir des nutriments, colonne par colonne.
+    Retourne nutriscore_points (entier, NA si un nutriment manque) et nutriscore_calcule (A a E)"""
+    missing = np.zeros(len(df), dtype=bool)
+    negative = np.zeros(len(df), dtype=np.int16)
+    for col, factor, thresholds in NUTRISCORE_NEGATIVE_POINTS:
+        values = _nutriment_values(df, col, factor)
+        missing |= np.isnan(values)
+        negative += _nutriscore_points(values, thresholds)
+
+    positive = {}
+    for col, factor, thresholds in (NUTRISCORE_FIBER_POINTS, NUTRISCORE_PROTEIN_POINTS):
+        values = _nutriment_values(df, col, factor)
+        if col in NUTRISCORE_OPTIONAL_COLUMNS:
+            values = np.nan_to_num(values, nan=0.0)
+        else:
+            missing |= np.isnan(values)
+        positive[col] = _nutriscore_points(values, thresholds)
+
+    proteins = np.where(negative >= NUTRISCORE_PROTEIN_CAP, 0, positive[NUTRISCORE_PROTEIN_POINTS[0]])
+    score = (negative - positive[NUTRISCORE_FIBER_POINTS[0]] - proteins).astype(np.int16)
+    grade_codes = np.searchsorted(NUTRISCORE_GRADE_BOUNDS, score, side='left').astype(np.int8)
+    grade_codes[missing] = -1
+
+    return pd.DataFrame({
+        "nutriscore_points": pd.arrays.IntegerArray(score, missing),
+        "nutriscore_calcule": pd.Categorical.from_codes(grade_codes, categories=NUTRISCORE_GRADES),
+    }, index=df.index)
+
+def _valid_grade(value):
+    grade = str(value).strip().upper()
+    return grade if grade in NUTRISCORE_CLASSIFICATIONS else None
+
+def nutriscore_grade_codes(series):
+    """Position A-E de la lettre fournie par l'API (-1 si absente ou invalide)"""
+    grades = apply_unique(series, _valid_grade)
+    return pd.Categorical(grades, categories=NUTRISCORE_GRADES).codes
+
+def classify_nutriscore_series(api_grades, computed_grades):
+    """Qualite nutritionnelle de la lettre de l'API, ou de la lettre calculee quand l'API n'en fournit pas"""
+    codes = nutriscore_grade_codes(api_grades)
+    computed = pd.Categorical(computed_grades, categories=NUTRISCORE_GRADES).codes
+    codes = np.where(codes >= 0, codes, computed)
+    labels = list(NUTRISCORE_CLASSIFICATIONS.values()) + ["Inconnu"]
+    return pd.Series(pd.Categorical.from_codes(np.where(codes >= 0, codes, len(labels) - 1), categories=labels),
+                     index=api_grades.index)
+
+def report_nutriscore_disagreements(df):
+    """Affiche et retourne les produits dont la lettre calculee differe de celle de l'API"""
+    api = nutriscore_grade_codes(df["nutriscore_grade"])
+    computed = pd.Categorical(df["nutriscore_calcule"], categories=NUTRISCORE_GRADES).codes
+    compared = (api >= 0) & (computed >= 0)
+    disagree = compared & (api != computed)
+    print(f"Nutri-Score : {int(disagree.sum())} desaccords sur {int(compared.sum())} lettres comparees, "
+          f"{int(((api < 0) & (computed >= 0)).sum())} lettres manquantes completees par le calcul")
+    columns = [col for col in ("code", "product_name", "nutriscore_grade", "nutriscore_calcule", "nutriscore_points")
+               if col in df.columns]
+    return df.loc[disagree, columns]
+
+def save_nutriscore_disagreements(df, transformed_path):
+    """Signale une seule fois les desaccords du DataFrame transforme complet
+    et les ecrit a cote du fichier transforme"""
+    disagreements = report_nutriscore_disagreements(df)
+    root, extension = os.path.splitext(transformed_path)
+    path = f"{root}_nutriscore_desaccords{extension}"
+    if is_parquet_path(path):
+        write_parquet(disagreements, path)
+    else:
+        disagreements.to_csv(path, index=False)
+    print(f"Desaccords Nutri-Score sauvegardes : {path}")
+    return disagreements
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def get_cleaned_marker_path(path):
+    """Retourne le chemin du marqueur de nettoyage associe a un fichier"""
+    return path + ".cleaned.json"
+
+def mark_as_cleaned(path, source_path=None, rows=None):
+    """Enregistre que le fichier est deja nettoye (et a partir de quelle source)"""
+    marker = {"cleaned": True, "version": 1, "rows": rows, "file": _file_signature(path)}
+    if source_path and os.path.exists(source_path):
+        marker["source"] = dict(_file_signature(source_path), path=os.path.abspath(source_path))
+    with open(get_cleaned_marker_path(path), "w", encoding="utf-8") as f:
+        json.dump(marker, f)
+
+def read_cleaned_marker(path):
+    """Lit le marqueur de nettoyage d'un fichier (dictionnaire vide s'il est absent)"""
+    try:
+        with open(get_cleaned_marker_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def is_marked_cleaned(path, source_path=None):
+    """Verifie qu'un fichier est marque comme nettoye et n'a pas ete modifie depuis"""
+    if not os.path.exists(path):
+        return False
+    marker = read_cleaned_marker(path)
+    if not marker.get("cleaned") or marker.get("file") != _file_signature(path):
+        return False
+    if source_path is not None:
+        source = dict(marker.get("source", {}))
+        if source.pop("path", None) != os.path.abspath(source_path) or not os.path.exists(source_path):
+            return False
+        return source == _file_signature(source_path)
+    return True
+
+def read_csv_header(path):
+    """Retourne les noms de colonnes d'un fichier CSV"""
+    return list(pd.read_csv(path, encoding='utf-8', nrows=0).columns)
+
+def read_products_csv(path, columns=None, chunksize=None):
+    """Lit un CSV de produits avec le schema commun des colonnes"""
+    if columns is not None:
+        header = read_csv_header(path)
+        columns = [col for col in header if col in set(columns)]
+
+    if chunksize is None and config['processing'].get('csv_engine', 'c') == 'pyarrow':
+        # Lecture multithread ; les types sont imposes pendant l'analyse, pas apres coup
+        table = pa_csv.read_csv(
+            path,
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=lambda row: "skip"),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: ARROW_CSV_TYPES[dtype] for name, dtype in CSV_READ_DTYPES.items()},
+                include_columns=columns,
+                strings_can_be_null=True,
+            ),
+        )
+        return coerce_numeric_columns(table.to_pandas())
+
+    options = {'encoding': 'utf-8', 'on_bad_lines': 'skip', 'dtype': CSV_READ_DTYPES}
+    if columns is not None:
+        options['usecols'] = columns
+    if chunksize is not None:
+        options['chunksize'] = chunksize
+        return (coerce_numeric_columns(chunk) for chunk in pd.read_csv(path, **options))
+    return coerce_numeric_columns(pd.read_csv(path, **options))
+
+def coerce_numeric_columns(df):
+    """Convertit les nutriments lus en texte vers float32 (NaN pour les valeurs non numeriques)"""
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype("float32")
+    return df
+
+def apply_product_schema(df):
+    """Convertit les colonnes connues d'un DataFrame vers le schema commun des produits"""
+    for col, dtype in PRODUCT_DTYPES.items():
+        if col in df.columns and dtype != str and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def format_csv_floats(df):
+    """Formate les colonnes float32 avec leur representation la plus courte pour l'ecriture CSV"""
+    float32_columns = [col for col in df.columns if df[col].dtype == "float32"]
+    if not float32_columns:
+        return df
+    df = df.copy()
+    for col in float32_columns:
+        values = df[col].to_numpy()
+        text = values.astype(str).astype(object)
+        text[pd.isna(values)] = None
+        df[col] = text
+    return df
+
+def write_products_csv(df, path, source_path=None):
+    """Ecrit un DataFrame deja nettoye et le marque comme tel"""
+    format_csv_floats(df).to_csv(path, index=False, encoding='utf-8', quoting=1)
+    mark_as_cleaned(path, source_path, rows=len(df))
+    print(f"Fichier CSV sauvegarde : {path}")
+
+def empty_strings_to_na(df):
+    """Remplace les chaines vides par NaN, comme les relit un fichier CSV"""
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if "" in df[col].cat.categories:
+                df[col] = df[col].cat.remove_categories([""])
+        elif df[col].dtype == object:
+            df[col] = df[col].mask(df[col].eq(""))
+    return df
+
+def parquet_schema(df):
+    """Schema Arrow d'un DataFrame : types fixes pour les colonnes produit, inferes pour les autres"""
+    # Sans schema fixe, une colonne toute vide deviendrait de type null
+    # et la largeur des index de dictionnaire changerait d'un fichier a l'autre
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for name, dtype in PRODUCT_DTYPES.items():
+        index = schema.get_field_index(name)
+        if index >= 0:
+            schema = schema.set(index, pa.field(name, ARROW_PRODUCT_TYPES[dtype]))
+    return schema
+
+def write_parquet(df, path):
+    """Ecrit un DataFrame en Parquet compresse en conservant les types des colonnes"""
+    # Un texte vide est relu NaN depuis une etape CSV : meme valeur en Parquet
+    df = empty_strings_to_na(df)
+    table = pa.Table.from_pandas(df, schema=parquet_schema(df), preserve_index=False)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression=config['files'].get('parquet_compression', 'zstd'))
+    os.replace(tmp_path, path)
+
+def export_csv_copy(df, path, source_path=None):
+    """Ecrit la copie CSV optionnelle d'un fichier d'etape Parquet"""
+    if config['files'].get('export_csv'):
+        write_products_csv(df, os.path.splitext(path)[0] + ".csv", source_path=source_path)
+
+def write_stage(df, path, source_path=None):
+    """Ecrit un fichier d'etape nettoye dans le format indique par son extension"""
+    if not is_parquet_path(path):
+        write_products_csv(df, path, source_path=source_path)
+        return
+    write_parquet(df, path)
+    mark_as_cleaned(path, source_path, rows=len(df))
+    print(f"Fichier Parquet sauvegarde : {path}")
+    export_csv_copy(df, path, source_path=source_path)
+
+def read_stage(path, columns=None):
+    """Lit un fichier d'etape (CSV ou Parquet), eventuellement limite a certaines colonnes"""
+    if is_parquet_path(path):
+        # Seules les colonnes demandees sont decodees
+        available = pq.read_schema(path).names
+        if columns is not None:
+            columns = [col for col in columns if col in available]
+        return pd.read_parquet(path, columns=columns)
+    return read_products_csv(path, columns=columns)
+
+def publish_cleaned_stage(input_path, output_path):
+    """Publie un fichier deja nettoye comme etape nettoyee, en le convertissant si besoin"""
+    if is_parquet_path(input_path) == is_parquet_path(output_path):
+        copy_cleaned_csv(input_path, output_path)
+    else:
+        write_stage(read_stage(input_path), output_path, source_path=input_path)
+
+def clean_stage_file(input_path, output_path):
+    """Nettoie un fichier d'etape Parquet existant"""
+    print(f"Chargement du fichier : {input_path}")
+    try:
+        if is_marked_cleaned(input_path):
+            print("Fichier deja nettoye : nettoyage ignore")
+            publish_cleaned_stage(input_path, output_path)
+            return read_cleaned_marker(output_path).get("rows") or 0
+        df = clean_products_frame(read_stage(input_path))
+        write_stage(df, output_path, source_path=input_path)
+        return len(df)
+    except Exception as e:
+        print(f"Erreur lors du nettoyage du fichier : {e}")
+        return None
+
+def copy_cleaned_csv(input_path, output_path):
+    """Publie un CSV deja nettoye comme fichier nettoye sans le relire"""
+    shutil.copyfile(input_path, output_path)
+    mark_as_cleaned(output_path, input_path, rows=read_cleaned_marker(input_path).get("rows"))
+    print(f"Fichier deja nettoye copie : {output_path}")
 
 def clean_csv_file(input_path, output_path):
     """Nettoie un fichier CSV existant"""
@@ -229,21 +1433,25 @@ def clean_csv_file(input_path, output_path):
     
     try:
         # Charger le fichier CSV
-        df = pd.read_csv(input_path, encoding='utf-8', on_bad_lines='skip')
+        df = read_products_csv(input_path)
         print(f"{len(df)} lignes chargees")
         
+        # Un fichier deja nettoye n'est pas nettoye une seconde fois
+        if is_marked_cleaned(input_path):
+            print("Fichier deja nettoye : nettoyage ignore")
+            if os.path.abspath(input_path) != os.path.abspath(output_path):
+                copy_cleaned_csv(input_path, output_path)
+            return df
+        
         # Nettoyer toutes les colonnes textuelles
-        text_columns = df.select_dtypes(include=['object']).columns
+        text_columns = df.select_dtypes(include=['object', 'category']).columns
         print(f"Nettoyage de {len(text_columns)} colonnes textuelles")
         
         for col in text_columns:
-            df[col] = df[col].apply(clean_text)
+            df[col] = clean_text_column(df[col], col)
         
         # Nettoyer les colonnes numeriques
-        numeric_columns = ['energy_kcal', 'fat_100g', 'saturated_fat_100g', 'sugars_100g', 
-                          'salt_100g', 'fiber_100g', 'proteins_100g', 'nutrition_score_fr']
-        
-        for col in numeric_columns:
+        for col in NUMERIC_COLUMNS:
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         
@@ -253,7 +1461,8 @@ def clean_csv_file(input_path, output_path):
         print(f"{len(df_cleaned)} lignes conservees apres nettoyage")
         
         # Sauvegarder
-        df_cleaned.to_csv(output_path, index=False, encoding='utf-8', quoting=1)
+        format_csv_floats(df_cleaned).to_csv(output_path, index=False, encoding='utf-8', quoting=1)
+        mark_as_cleaned(output_path, input_path, rows=len(df_cleaned))
         print(f"Fichier nettoye sauvegarde : {output_path}")
         
         return df_cleaned
@@ -262,77 +1471,570 @@ def clean_csv_file(input_path, output_path):
         print(f"Erreur lors du nettoyage : {e}")
         return None
 
-def save_to_csv(df, path):
-    """Sauvegarde le DataFrame en CSV avec nettoyage"""
-    print("Nettoyage des donnees avant sauvegarde")
-    
+def clean_csv_chunk(chunk, text_columns):
+    """Nettoie un bloc lu depuis un CSV avec les memes regles que clean_csv_file"""
+    for col in chunk.columns:
+        if col in text_columns:
+            chunk[col] = clean_text_column(chunk[col], col)
+
+    for col in NUMERIC_COLUMNS:
+        if col in chunk.columns:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+
+    # Meme seuil que le nettoyage complet : il ne depend que du nombre de colonnes
+    return chunk.dropna(thresh=len(chunk.columns) * 0.3)
+
+def clean_csv_file_chunked(input_path, output_path, chunksize=None):
+    """Nettoie un fichier CSV par blocs pour garder une memoire constante, retourne le nombre de lignes conservees"""
+    if chunksize is None:
+        chunksize = config['processing']['clean_chunksize']
+    # Meme chemin que le nettoyage parallele, avec un seul processus : les blocs sont traites sur place
+    return clean_csv_file_parallel(input_path, output_path, workers=1, chunksize=chunksize)
+
+def _apply_to_chunk_file(func, input_path, output_path):
+    """Execute func sur un bloc lu depuis le disque (processus de travail)"""
+    df = func(pd.read_pickle(input_path))
+    df.to_pickle(output_path)
+    return len(df)
+
+def run_in_parallel(chunks, func, workers=None):
+    """Applique func aux blocs sur un pool de processus et les renvoie dans l'ordre d'origine"""
+    if workers is None:
+        workers = config['processing']['workers']
+    if workers <= 1:
+        # Un seul processus : pas de pool ni de fichiers temporaires
+        yield from map(func, chunks)
+        return
+    # Les blocs transitent par des fichiers temporaires plutot que par le pipe du pool
+    work_dir = tempfile.mkdtemp(prefix="openfoodfacts_chunks_")
+    pending = deque()
+
+    def collect():
+        future, output_path = pending.popleft()
+        future.result()
+        result = pd.read_pickle(output_path)
+        os.remove(output_path)
+        return result
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for i, chunk in enumerate(chunks):
+                input_path = os.path.join(work_dir, f"in_{i:06d}.pkl")
+                output_path = os.path.join(work_dir, f"out_{i:06d}.pkl")
+                chunk.to_pickle(input_path)
+                del chunk
+                pending.append((executor.submit(_apply_to_chunk_file, func, input_path, output_path), output_path))
+                # Nombre borne de blocs en attente sur le disque
+                while len(pending) > workers * 2:
+                    yield collect()
+            while pending:
+                yield collect()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def split_frame(df, chunksize=None):
+    """Decoupe un DataFrame en blocs de lignes"""
+    if chunksize is None:
+        chunksize = config['processing']['parallel_chunksize']
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def _restore_categories(df):
+    """Reconvertit en category les colonnes repetitives apres concatenation de blocs"""
+    for col in CATEGORICAL_COLUMNS + ["qualite_nutritionnelle"]:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype("category")
+    return df
+
+def run_frame_in_parallel(df, func, workers=None, chunksize=None):
+    """Applique func a un DataFrame par blocs sur plusieurs processus et reassemble le resultat"""
+    if workers is None:
+        workers = config['processing']['workers']
+    if chunksize is None:
+        chunksize = config['processing']['parallel_chunksize']
+    if workers <= 1 or len(df) <= chunksize:
+        return func(df)
+    print(f"Traitement parallele : {workers} processus, blocs de {chunksize} lignes")
+    parts = list(run_in_parallel(split_frame(df, chunksize), func, workers))
+    return _restore_categories(pd.concat(parts))
+
+def clean_csv_file_parallel(input_path, output_path, workers=None, chunksize=None):
+    """Nettoie un fichier CSV par blocs sur plusieurs processus (sur place avec un seul),
+    retourne le nombre de lignes conservees"""
+    if workers is None:
+        workers = config['processing']['workers']
+    if chunksize is None:
+        chunksize = config['processing']['parallel_chunksize']
+    if workers <= 1:
+        print(f"Nettoyage par blocs de {chunksize} lignes : {input_path}")
+    else:
+        print(f"Nettoyage parallele ({workers} processus, blocs de {chunksize} lignes) : {input_path}")
+
+    if is_marked_cleaned(input_path):
+        print("Fichier deja nettoye : nettoyage ignore")
+        copy_cleaned_csv(input_path, output_path)
+        return read_cleaned_marker(output_path).get("rows") or 0
+
+    tmp_path = output_path + ".tmp"
+    kept_count = 0
+    try:
+        reader = read_products_csv(input_path, chunksize=chunksize)
+        first_chunk = next(reader, None)
+        if first_chunk is None:
+            print("Fichier vide : rien a nettoyer")
+            return None
+        # Les colonnes textuelles du premier bloc s'appliquent a tous les blocs
+        text_columns = set(first_chunk.select_dtypes(include=['object', 'category']).columns)
+        func = partial(clean_csv_chunk, text_columns=text_columns)
+
+        def chunks():
+            yield first_chunk
+            yield from reader
+
+        for i, chunk in enumerate(run_in_parallel(chunks(), func, workers)):
+            format_csv_floats(chunk).to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0,
+                         index=False, encoding='utf-8', quoting=1)
+            kept_count += len(chunk)
+            print(f"Bloc {i + 1} nettoye : {kept_count} lignes conservees")
+
+        os.replace(tmp_path, output_path)
+        mark_as_cleaned(output_path, input_path, rows=kept_count)
+        print(f"Fichier nettoye sauvegarde : {output_path}")
+        return kept_count
+
+    except Exception as e:
+        print(f"Erreur lors du nettoyage par blocs : {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+def clean_products_frame(df):
+    """Nettoie les colonnes d'un DataFrame de produits et supprime les lignes trop incompletes"""
     # Nettoyer les noms de colonnes
     df.columns = [clean_column_name(col) for col in df.columns]
     
     # Nettoyer toutes les colonnes textuelles
-    text_columns = df.select_dtypes(include=['object']).columns
+    text_columns = df.select_dtypes(include=['object', 'category']).columns
     for col in text_columns:
-        df[col] = df[col].apply(clean_text)
+        df[col] = clean_text_column(df[col], col)
     
     # Nettoyer les colonnes numeriques
-    numeric_columns = ['energy_kcal', 'fat_100g', 'saturated_fat_100g', 'sugars_100g', 
-                      'salt_100g', 'fiber_100g', 'proteins_100g', 'nutrition_score_fr']
-    
-    for col in numeric_columns:
+    for col in NUMERIC_COLUMNS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
     
     # Supprimer les lignes avec trop de valeurs manquantes
-    df = df.dropna(thresh=len(df.columns) * 0.3)
+    return apply_product_schema(df.dropna(thresh=len(df.columns) * 0.3))
+
+def save_to_csv(df, path):
+    """Sauvegarde le DataFrame en CSV avec nettoyage"""
+    print("Nettoyage des donnees avant sauvegarde")
+    df = run_frame_in_parallel(df, clean_products_frame)
     
     # Sauvegarder
-    df.to_csv(path, index=False, encoding='utf-8', quoting=1)
-    print(f"Fichier CSV sauvegarde : {path}")
+    write_stage(df, path)
+    return df
 
-def load_to_bigquery(csv_path, table_id):
-    """Charge les donnees dans BigQuery"""
-    credentials_path = get_credentials_path()
-    if not credentials_path:
-        print("Impossible de charger dans BigQuery : fichier de credentials non trouve")
-        return
-    
+BIGQUERY_TYPES = {"str": "STRING", "float": "FLOAT"}
+ARROW_LOAD_TYPES = {"STRING": pa.string(), "FLOAT": pa.float64(), "INTEGER": pa.int64()}
+
+def get_bigquery_schema(columns=None, fields=None):
+    """Derive le schema BigQuery de la specification des colonnes du produit"""
+    if fields is None:
+        fields = EXTRACTION_FIELDS
+    field_types = {name: field_type for name, _, field_type in fields}
+    if columns is None:
+        columns = list(field_types)
+    return [bigquery.SchemaField(col, BIGQUERY_TYPES[field_types.get(col, "str")]) for col in columns]
+
+def widen_float32_columns(df):
+    """Passe les colonnes float32 en float64 par leur representation decimale la plus courte,
+    comme format_csv_floats : 0.1 reste 0.1 au lieu de 0.10000000149011612"""
+    float32_columns = [col for col in df.columns if df[col].dtype == "float32"]
+    if not float32_columns:
+        return df
+    df = df.copy(deep=False)
+    for col in float32_columns:
+        df[col] = df[col].to_numpy().astype(str).astype(np.float64)
+    return df
+
+def write_bigquery_parquet(df, path, schema):
+    """Serialise un DataFrame en Parquet compresse avec exactement les types du schema BigQuery"""
+    arrow_schema = pa.schema([(field.name, ARROW_LOAD_TYPES[field.field_type]) for field in schema])
+    df = widen_float32_columns(df[[field.name for field in schema]])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table.cast(arrow_schema), path,
+                   compression=config['files'].get('parquet_compression', 'zstd'))
+
+def get_table_layout():
+    """Retourne le partitionnement et le clustering configures pour la table chargee"""
+    gc = config['google_cloud']
+    partitioning = gc.get('partitioning', 'none')
+    if partitioning not in ('none', 'ingestion', 'run_id'):
+        raise ValueError(f"Partitionnement inconnu : {partitioning}")
+    run_id = gc.get('run_id')
+    return {
+        'partitioning': partitioning,
+        'partition_overwrite': gc.get('partition_overwrite', False),
+        # Par defaut une execution par jour : numero du jour UTC depuis 1970
+        'run_id': int(run_id) if run_id else int(time.time() // 86400),
+        'run_id_range': gc.get('run_id_range', [19000, 29000, 1]),
+        'clustering_fields': gc.get('clustering_fields', []),
+    }
+
+def get_clustering_fields(columns, layout):
+    """Colonnes de clustering presentes dans la table (BigQuery en accepte quatre)"""
+    return [col for col in layout['clustering_fields'] if col in columns][:4]
+
+def get_partition_id(layout):
+    """Partition ecrite par l'execution courante (suffixe du decorateur table$partition)"""
+    if layout['partitioning'] == 'ingestion':
+        return time.strftime("%Y%m%d", time.gmtime())
+    if layout['partitioning'] == 'run_id':
+        start, _, interval = layout['run_id_range']
+        # Une partition par plage : elle est designee par le debut de sa plage
+        return str(start + (layout['run_id'] - start) // interval * interval)
+    return None
+
+def configure_table_layout(job_config, columns, layout):
+    """Ajoute au job de chargement le partitionnement et le clustering de la table cible"""
+    if layout['partitioning'] == 'ingestion':
+        job_config.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY)
+    elif layout['partitioning'] == 'run_id':
+        start, end, interval = layout['run_id_range']
+        job_config.range_partitioning = bigquery.RangePartitioning(
+            field="run_id", range_=bigquery.PartitionRange(start=start, end=end, interval=interval)
+        )
+    clustering_fields = get_clustering_fields(columns, layout)
+    if clustering_fields:
+        job_config.clustering_fields = clustering_fields
+
+def load_to_bigquery(csv_path, table_id, write_disposition="WRITE_TRUNCATE", client=None, load_format=None,
+                     layout=None):
+    """Charge les donnees dans BigQuery (CSV ou Parquet selon le fichier et BIGQUERY_LOAD_FORMAT).
+    layout (voir get_table_layout) partitionne et cluster la table creee"""
+    if load_format is None:
+        load_format = config['google_cloud'].get('load_format', 'csv')
+    if layout is not None and layout['partitioning'] == 'run_id':
+        # La colonne de partition run_id est ajoutee au lot : il faut un schema explicite
+        load_format = 'parquet'
+    if client is None:
+        credentials_path = get_credentials_path()
+        if not credentials_path:
+            print("Impossible de charger dans BigQuery : fichier de credentials non trouve")
+            return False
+
+    upload_path = csv_path
     try:
-        client = bigquery.Client()
-        print("Connexion BigQuery etablie")
+        if client is None:
+            client = bigquery.Client()
+            print("Connexion BigQuery etablie")
+
+        if is_parquet_path(csv_path) or load_format == 'parquet':
+            # Types fixes d'une execution a l'autre : BigQuery ne les redetecte pas
+            df = read_stage(csv_path)
+            schema = get_bigquery_schema(df.columns)
+            if layout is not None and layout['partitioning'] == 'run_id':
+                df["run_id"] = layout['run_id']
+                schema.append(bigquery.SchemaField("run_id", "INTEGER"))
+            columns = [field.name for field in schema]
+            upload_path = os.path.splitext(csv_path)[0] + ".load.parquet"
+            write_bigquery_parquet(df, upload_path, schema)
+            del df
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                schema=schema,
+                write_disposition=write_disposition
+            )
+        else:
+            columns = read_csv_header(csv_path)
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.CSV,
+                skip_leading_rows=1,
+                autodetect=True,
+                write_disposition=write_disposition,
+                max_bad_records=10,
+                ignore_unknown_values=True
+            )
         
-        job_config = bigquery.LoadJobConfig(
-            source_format=bigquery.SourceFormat.CSV,
-            skip_leading_rows=1,
-            autodetect=True,
-            write_disposition="WRITE_TRUNCATE",
-            max_bad_records=10,
-            ignore_unknown_values=True
-        )
+        destination = table_id
+        if layout is not None:
+            configure_table_layout(job_config, columns, layout)
+            partition_id = get_partition_id(layout)
+            if layout['partition_overwrite'] and partition_id and write_disposition == "WRITE_TRUNCATE":
+                # Seule la partition de l'execution est remplacee, les autres sont conservees
+                destination = f"{table_id}${partition_id}"
         
-        with open(csv_path, "rb") as source_file:
-            job = client.load_table_from_file(source_file, table_id, job_config=job_config)
+        # Sans taille annoncee, le client envoie le fichier par morceaux en upload resumable
+        with open(upload_path, "rb") as source_file:
+            job = client.load_table_from_file(source_file, destination, job_config=job_config)
         job.result()
-        print(f"Donnees chargees dans BigQuery : {table_id}")
+        print(f"Donnees chargees dans BigQuery : {destination}")
+        return True
     except Exception as e:
         print(f"Erreur lors du chargement dans BigQuery : {e}")
+        return False
+    finally:
+        if upload_path != csv_path and os.path.exists(upload_path):
+            os.remove(upload_path)
 
-def get_data_from_bigquery(table_id):
-    """Recupere les donnees depuis BigQuery"""
-    credentials_path = get_credentials_path()
-    if not credentials_path:
-        print("Impossible de recuperer depuis BigQuery : fichier de credentials non trouve")
-        return pd.DataFrame()
-    
+def _merge_changed_condition(columns):
+    """Condition SQL vraie quand une ligne de la cible differe de la ligne du lot"""
+    checks = [f"T.`{col}` IS DISTINCT FROM S.`{col}`" for col in columns if col != "code"]
+    return "(" + " OR ".join(checks + ["T.is_deleted IS TRUE"]) + ")"
+
+def _merge_source(staging_id):
+    """Lot dedoublonne sur le code : le MERGE n'accepte qu'une ligne source par ligne cible"""
+    return (f"(SELECT * FROM `{staging_id}` WHERE code IS NOT NULL AND code != '' "
+            f"QUALIFY ROW_NUMBER() OVER (PARTITION BY code) = 1)")
+
+def build_cluster_clause(clustering_fields):
+    """Clause CLUSTER BY d'une instruction CREATE TABLE (vide sans colonnes)"""
+    if not clustering_fields:
+        return ""
+    return f"CLUSTER BY {', '.join(f'`{col}`' for col in clustering_fields)} "
+
+# Noms historiques des types du schema et leur equivalent dans les instructions GoogleSQL
+GOOGLESQL_TYPES = {"FLOAT": "FLOAT64", "INTEGER": "INT64", "BOOLEAN": "BOOL"}
+
+def build_prepare_target_sql(target_id, staging_id, schema, clustering_fields=None):
+    """Cree la table cible si besoin et y ajoute les colonnes du lot et is_deleted"""
+    columns = [f"ADD COLUMN IF NOT EXISTS `{field.name}` {GOOGLESQL_TYPES.get(field.field_type, field.field_type)}"
+               for field in schema]
+    columns.append("ADD COLUMN IF NOT EXISTS is_deleted BOOL")
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{target_id}` {build_cluster_clause(clustering_fields)}AS "
+        f"SELECT *, FALSE AS is_deleted FROM `{staging_id}` WHERE FALSE;\n"
+        f"ALTER TABLE `{target_id}` {', '.join(columns)};"
+    )
+
+def build_cast_code_sql(target_id, table):
+    """Recree la table cible avec un code en texte (table creee par un chargement a schema detecte),
+    en conservant son partitionnement par plage et son clustering"""
+    partition = ""
+    if table.range_partitioning is not None:
+        bounds = table.range_partitioning.range_
+        partition = (f"PARTITION BY RANGE_BUCKET(`{table.range_partitioning.field}`, "
+                     f"GENERATE_ARRAY({bounds.start}, {bounds.end}, {bounds.interval})) ")
+    elif table.time_partitioning is not None:
+        raise ValueError(f"Colonne code de {target_id} non textuelle dans une table partitionnee par date : "
+                         f"conversion en STRING a faire manuellement")
+    return (
+        f"CREATE OR REPLACE TABLE `{target_id}` {partition}{build_cluster_clause(table.clustering_fields)}AS "
+        f"SELECT * REPLACE (CAST(code AS STRING) AS code) FROM `{target_id}`"
+    )
+
+def build_count_duplicates_sql(target_id):
+    """Compte les lignes en trop de la table cible (plusieurs lignes pour un meme code)"""
+    return f"SELECT COUNT(code) - COUNT(DISTINCT code) AS duplicates FROM `{target_id}`"
+
+def build_dedupe_target_sql(target_id):
+    """Ne garde qu'une ligne par code dans la table cible, comme l'entrepot SQLite avant la fusion"""
+    duplicated = f"SELECT code FROM `{target_id}` WHERE code IS NOT NULL GROUP BY code HAVING COUNT(*) > 1"
+    return (
+        "BEGIN TRANSACTION;\n"
+        f"CREATE TEMP TABLE doublons AS SELECT * FROM `{target_id}` WHERE code IN ({duplicated}) "
+        "QUALIFY ROW_NUMBER() OVER (PARTITION BY code) = 1;\n"
+        f"DELETE FROM `{target_id}` WHERE code IN (SELECT code FROM doublons);\n"
+        f"INSERT INTO `{target_id}` SELECT * FROM doublons;\n"
+        "COMMIT TRANSACTION;"
+    )
+
+def build_upsert_counts_sql(target_id, staging_id, columns, soft_delete=False):
+    """Compte les produits inseres, modifies, inchanges (et supprimes) par le MERGE"""
+    changed = _merge_changed_condition(columns)
+    deleted = (
+        f"(SELECT COUNT(*) FROM `{target_id}` T WHERE T.is_deleted IS NOT TRUE "
+        f"AND T.code NOT IN (SELECT code FROM {_merge_source(staging_id)}))"
+        if soft_delete else "0"
+    )
+    return (
+        f"SELECT COUNTIF(T.code IS NULL) AS inserted, "
+        f"COUNTIF(T.code IS NOT NULL AND {changed}) AS updated, "
+        f"COUNTIF(T.code IS NOT NULL AND NOT {changed}) AS unchanged, "
+        f"{deleted} AS deleted "
+        f"FROM {_merge_source(staging_id)} S LEFT JOIN `{target_id}` T ON T.code = S.code"
+    )
+
+def build_merge_sql(target_id, staging_id, columns, soft_delete=False):
+    """Genere le MERGE du lot de staging dans la table cible sur le code produit"""
+    updates = ", ".join([f"`{col}` = S.`{col}`" for col in columns if col != "code"] + ["is_deleted = FALSE"])
+    insert_columns = ", ".join([f"`{col}`" for col in columns] + ["is_deleted"])
+    insert_values = ", ".join([f"S.`{col}`" for col in columns] + ["FALSE"])
+    sql = (
+        f"MERGE `{target_id}` T\n"
+        f"USING {_merge_source(staging_id)} S\n"
+        f"ON T.code = S.code\n"
+        f"WHEN MATCHED AND {_merge_changed_condition(columns)} THEN\n"
+        f"  UPDATE SET {updates}\n"
+        f"WHEN NOT MATCHED BY TARGET THEN\n"
+        f"  INSERT ({insert_columns}) VALUES ({insert_values})"
+    )
+    if soft_delete:
+        # Les produits absents du lot sont conserves mais marques comme supprimes
+        sql += "\nWHEN NOT MATCHED BY SOURCE AND T.is_deleted IS NOT TRUE THEN\n  UPDATE SET is_deleted = TRUE"
+    return sql
+
+def upsert_to_bigquery(csv_path, table_id, soft_delete=False, client=None):
+    """Charge le lot dans une table de staging puis le fusionne dans la cible sur le code.
+    Retourne les compteurs inserted/updated/unchanged/deleted (None en cas d'echec)"""
+    if client is None:
+        credentials_path = get_credentials_path()
+        if not credentials_path:
+            print("Impossible de charger dans BigQuery : fichier de credentials non trouve")
+            return None
+
+    staging_id = table_id + config['google_cloud'].get('staging_suffix', '_staging')
+    try:
+        if client is None:
+            client = bigquery.Client()
+            print("Connexion BigQuery etablie")
+
+        # Seul le lot est charge : le cout ne depend plus de la taille du catalogue
+        # Schema explicite : detecte, un code tout en chiffres deviendrait INTEGER et perdrait ses zeros
+        if not load_to_bigquery(csv_path, staging_id, write_disposition="WRITE_TRUNCATE", client=client,
+                                load_format='parquet'):
+            return None
+        schema = client.get_table(staging_id).schema
+        columns = [field.name for field in schema]
+        if "code" not in columns:
+            print("Fusion impossible : colonne code absente du lot")
+            return None
+
+        # Le clustering sur code limite les blocs lus par le MERGE
+        clustering_fields = get_clustering_fields(columns, get_table_layout())
+        client.query(build_prepare_target_sql(table_id, staging_id, schema, clustering_fields)).result()
+        # Une cible creee par un chargement CSV a schema detecte peut avoir un code INTEGER
+        target = client.get_table(table_id)
+        code_type = next(field.field_type for field in target.schema if field.name == "code")
+        if code_type != "STRING":
+            print(f"Colonne code de type {code_type} dans {table_id} : conversion en STRING")
+            client.query(build_cast_code_sql(table_id, target)).result()
+        # Des doublons de code dans la cible fausseraient les compteurs et le MERGE
+        duplicates = int(next(iter(client.query(build_count_duplicates_sql(table_id)).result()))["duplicates"] or 0)
+        if duplicates:
+            client.query(build_dedupe_target_sql(table_id)).result()
+            print(f"{duplicates} doublons de code supprimes de {table_id} avant la fusion")
+        row = next(iter(client.query(build_upsert_counts_sql(table_id, staging_id, columns, soft_delete)).result()))
+        counts = {key: int(row[key] or 0) for key in ("inserted", "updated", "unchanged", "deleted")}
+        client.query(build_merge_sql(table_id, staging_id, columns, soft_delete)).result()
+        client.delete_table(staging_id, not_found_ok=True)
+
+        print(f"Fusion dans {table_id} : {counts['inserted']} inseres, {counts['updated']} modifies, "
+              f"{counts['unchanged']} inchanges, {counts['deleted']} marques supprimes")
+        return counts
+    except Exception as e:
+        print(f"Erreur lors de la fusion dans BigQuery : {e}")
+        return None
+
+def get_bqstorage_client():
+    """Client de l'API BigQuery Storage (lecture parallele par flux) s'il est installe"""
     try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        print("google-cloud-bigquery-storage non installe : lecture par l'API REST")
+        return None
+    return bigquery_storage.BigQueryReadClient()
+
+def build_select_sql(table_id, columns, where=None):
+    """Genere la requete de lecture limitee aux colonnes et aux lignes utiles"""
+    sql = f"SELECT {', '.join(f'`{col}`' for col in columns)} FROM `{table_id}`"
+    if where:
+        sql += f" WHERE {where}"
+    return sql
+
+def iter_bigquery_batches(table_id, columns=None, where=None, client=None, use_bqstorage=None):
+    """Lit une table BigQuery en flux de RecordBatch Arrow (colonnes et lignes filtrees cote serveur).
+    where peut etre une fonction qui recoit les colonnes lues et retourne le filtre"""
+    if use_bqstorage is None:
+        use_bqstorage = config['google_cloud'].get('use_bqstorage', False)
+    if client is None:
         client = bigquery.Client()
-        query = f"SELECT * FROM `{table_id}`"
-        df = client.query(query).to_dataframe()
-        print(f"{len(df)} lignes recuperees depuis BigQuery")
+    available = [field.name for field in client.get_table(table_id).schema]
+    if columns is None:
+        columns = available
+    else:
+        columns = [col for col in columns if col in available]
+    if callable(where):
+        where = where(columns)
+    bqstorage_client = get_bqstorage_client() if use_bqstorage else None
+    rows = client.query(build_select_sql(table_id, columns, where)).result()
+    yield from rows.to_arrow_iterable(bqstorage_client=bqstorage_client)
+
+def get_data_from_bigquery(table_id, active_only=False, columns=None, where=None, client=None):
+    """Recupere les donnees depuis BigQuery (sans les produits marques supprimes si active_only)"""
+    if client is None:
+        credentials_path = get_credentials_path()
+        if not credentials_path:
+            print("Impossible de recuperer depuis BigQuery : fichier de credentials non trouve")
+            return pd.DataFrame()
+    
+    try:
+        if client is None:
+            client = bigquery.Client()
+        if active_only:
+            row_filter = where
+
+            def where(selected):
+                clause = row_filter(selected) if callable(row_filter) else row_filter
+                return f"({clause}) AND is_deleted IS NOT TRUE" if clause else "is_deleted IS NOT TRUE"
+
+            if columns is None:
+                columns = [field.name for field in client.get_table(table_id).schema if field.name != "is_deleted"]
+        batches = list(iter_bigquery_batches(table_id, columns, where, client=client))
+        if not batches:
+            print("0 lignes recuperees depuis BigQuery")
+            return pd.DataFrame()
+        # Les colonnes numeriques sans valeurs manquantes sont converties sans copie
+        df = pa.Table.from_batches(batches).to_pandas(split_blocks=True, self_destruct=True)
+        del batches
+        print(f"{len(df)} lignes recuperees depuis BigQuery ({len(df.columns)} colonnes)")
         return df
     except Exception as e:
         print(f"Erreur lors de la recuperation depuis BigQuery : {e}")
         return pd.DataFrame()
 
+def _normalize_grade(value):
+    """Met en majuscules un nutriscore (vide s'il est manquant)"""
+    if pd.isna(value):
+        return ""
+    return value.upper() if isinstance(value, str) else float('nan')
+
+# Delimiteurs de mots pour INITCAP : espaces, ponctuation et chiffres ASCII, plus la ponctuation
+# et les espaces Unicode (apostrophe typographique, guillemets, tirets...)
+INITCAP_DELIMITERS = string.whitespace + string.punctuation + string.digits + "".join(
+    char for char in map(chr, range(0x80, 0x10000)) if unicodedata.category(char)[0] in "PZ"
+)
+
+@lru_cache(maxsize=8)
+def _initcap_word_pattern(delimiters):
+    return re.compile(f"[^{re.escape(delimiters)}]+")
+
+def initcap(value, delimiters=INITCAP_DELIMITERS):
+    """INITCAP de BigQuery : majuscule au debut de chaque mot, minuscules ailleurs.
+    Regle commune aux transformations pandas et SQL (au lieu de str.title())"""
+    return _initcap_word_pattern(delimiters).sub(lambda match: match.group(0)[0].upper() + match.group(0)[1:].lower(),
+                                                 value)
+
+def _normalize_text_value(value):
+    """Normalise une valeur textuelle : minuscules, traduction, translitteration, majuscule initiale des mots"""
+    if pd.isna(value):
+        value = ""
+    if not isinstance(value, str):
+        return float('nan')
+    return initcap(rewrite_text(value.lower().strip())).strip()
+
+TRANSFORM_NUMERIC_COLUMNS = ['energy_kcal', 'fat_100g', 'sugars_100g', 'proteins_100g',
+                             'fiber_100g', 'salt_100g', 'saturated_fat_100g']
+TRANSFORM_TEXT_COLUMNS = ["labels", "brands", "categories", "origins", "stores"]
+TRANSFORM_REQUIRED_COLUMNS = ["energy_kcal", "sugars_100g", "saturated_fat_100g", "proteins_100g", "fiber_100g"]
+
+def transform_predicate(columns):
+    """Filtre SQL des lignes que transform_data conserverait de toute facon"""
+    filters = ["LOWER(COALESCE(product_name, 'Inconnu')) != 'inconnu'"] if "product_name" in columns else []
+    filters += [f"`{col}` IS NOT NULL" for col in TRANSFORM_REQUIRED_COLUMNS if col in columns]
+    return " AND ".join(filters)
+
 def transform_data(df):
     """Transforme les donnees avec toutes les fonctionnalites"""
     if df.empty:
@@ -342,21 +2044,18 @@ def transform_data(df):
     print("Transformation des donnees")
 
     # Conversion des colonnes numeriques
-    numeric_cols = ['energy_kcal', 'fat_100g', 'sugars_100g', 'proteins_100g', 
-                   'fiber_100g', 'salt_100g', 'saturated_fat_100g']
-    
-    for col in numeric_cols:
+    for col in TRANSFORM_NUMERIC_COLUMNS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
 
-    # Nettoyage des donnees textuelles
-    df['nutriscore_grade'] = df['nutriscore_grade'].fillna("").str.upper()
+    # Nettoyage des donnees textuelles (une fois par valeur distincte)
+    df['nutriscore_grade'] = apply_unique(df['nutriscore_grade'], _normalize_grade)
     df['product_name'] = df['product_name'].fillna("Inconnu")
     
-    # Nettoyage des colonnes textuelles
-    for col in ["labels", "brands", "categories", "origins", "stores"]:
+    # Nettoyage, traductions et translitteration des colonnes textuelles
+    for col in TRANSFORM_TEXT_COLUMNS:
         if col in df.columns:
-            df[col] = df[col].fillna("").str.lower().str.strip()
+            df[col] = apply_unique(df[col], _normalize_text_value)
     
     # Suppression des lignes inutiles
     df = df[df["product_name"].str.lower() != "inconnu"]
@@ -364,18 +2063,13 @@ def transform_data(df):
     df = df.dropna(thresh=min_non_null)
     
     # Suppression des lignes avec trop de valeurs manquantes
-    important_cols = ["energy_kcal", "sugars_100g", "saturated_fat_100g", "proteins_100g", "fiber_100g"]
-    available_cols = [col for col in important_cols if col in df.columns]
+    available_cols = [col for col in TRANSFORM_REQUIRED_COLUMNS if col in df.columns]
     if available_cols:
         df = df.dropna(subset=available_cols)
     
-    # Traductions et translitteration
-    for col in ["labels", "categories", "stores", "brands", "origins"]:
-        if col in df.columns:
-            df[col] = df[col].apply(translate_text)
-            df[col] = df[col].apply(transliterate_text)
-            df[col] = df[col].str.title().str.strip()
-    
+    # Nutri-Score calcule a partir des nutriments (desaccords signales par save_nutriscore_disagreements)
+    df = df.join(compute_nutriscore(df))
+
     # Ajout de colonnes derivees
     df['has_label_bio'] = df['labels'].str.contains("bio", case=False, na=False)
 
@@ -394,74 +2088,880 @@ def transform_data(df):
         (df["proteins_100g"].fillna(0) + df["fiber_100g"].fillna(0))
     )
     
-    # Classification de la qualite nutritionnelle
-    df["qualite_nutritionnelle"] = df["nutriscore_grade"].apply(classify_nutriscore)
+    # Classification de la qualite nutritionnelle (lettre calculee si l'API n'en fournit pas)
+    df["qualite_nutritionnelle"] = classify_nutriscore_series(df["nutriscore_grade"], df["nutriscore_calcule"])
 
     print("Donnees transformees")
     return df
 
+def sql_literal(value, dialect="bigquery"):
+    """Ecrit une chaine comme litteral SQL du dialecte"""
+    if dialect == "bigquery":
+        escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+        # Les caracteres de controle ne peuvent pas apparaitre tels quels dans un litteral BigQuery
+        escaped = re.sub(r"[\x00-\x1f]", lambda match: f"\\x{ord(match.group(0)):02x}", escaped)
+        return "'" + escaped + "'"
+    return "'" + value.replace("'", "''") + "'"
+
+def sql_identifier(name, dialect="bigquery"):
+    """Ecrit un nom de table ou de colonne comme identifiant SQL du dialecte"""
+    if dialect == "bigquery":
+        return f"`{name}`"
+    return '"' + name.replace('"', '""') + '"'
+
+def _rewrite_token_pattern(dialect="bigquery"):
+    """Expression reguliere qui decoupe un texte en mots, separateurs et termes composes du TEXT_REWRITER"""
+    # \w n'est qu'ASCII en BigQuery : classes Unicode equivalentes au \w de Python
+    word, separator = (r"[\pL\pN_]", r"[^\pL\pN_]") if dialect == "bigquery" else (r"\w", r"\W")
+    # Un terme compose (ex. gluten-free) forme un seul morceau, avec les lettres qui le suivent :
+    # il n'est remplace que s'il termine le mot, comme avec \b
+    compounds = [re.escape(term) + word + "*"
+                 for term in sorted(TEXT_REWRITER.replacements, key=len, reverse=True)
+                 if not re.fullmatch(r"\w+", term)]
+    return "|".join(compounds + [word + "+", separator + "+"])
+
+def build_rewrite_terms_sql(dialect="bigquery"):
+    """Table de correspondance terme -> traduction du TEXT_REWRITER, en CTE termes"""
+    literal = partial(sql_literal, dialect=dialect)
+    pairs = [(literal(term), literal(value)) for term, value in TEXT_REWRITER.replacements.items()]
+    if dialect == "bigquery":
+        rows = ", ".join(f"({term}, {value})" for term, value in pairs)
+        # Une seule ligne : le tableau est deplie dans chaque sous-requete de reecriture
+        return f"termes AS (\n  SELECT ARRAY<STRUCT<terme STRING, valeur STRING>>[{rows}] AS termes\n)"
+    if not pairs:
+        return "termes(terme, valeur) AS (\n  SELECT NULL, NULL WHERE 0\n)"
+    rows = ",\n    ".join(f"({term}, {value})" for term, value in pairs)
+    return f"termes(terme, valeur) AS (\n  VALUES\n    {rows}\n)"
+
+def build_rewrite_sql(expression, dialect="bigquery"):
+    """Expression SQL equivalente a rewrite_text : les morceaux du texte sont joints a la table termes"""
+    pattern = sql_literal(_rewrite_token_pattern(dialect), dialect)
+    if dialect == "bigquery":
+        rewritten = (f"(SELECT STRING_AGG(COALESCE(terme.valeur, morceau), '' ORDER BY position) "
+                     f"FROM UNNEST(REGEXP_EXTRACT_ALL({expression}, {pattern})) AS morceau WITH OFFSET AS position "
+                     f"LEFT JOIN UNNEST(termes.termes) AS terme ON terme.terme = morceau)")
+    else:
+        rewritten = (f"(SELECT GROUP_CONCAT(texte, '') FROM (SELECT COALESCE(termes.valeur, morceau.value) AS texte "
+                     f"FROM json_each(REGEXP_EXTRACT_ALL({expression}, {pattern})) AS morceau "
+                     f"LEFT JOIN termes ON termes.terme = morceau.value ORDER BY morceau.key))")
+    return f"COALESCE({rewritten}, '')"
+
+def _nutriscore_points_sql(expression, thresholds):
+    """Points d'un nutriment : nombre de seuils strictement depasses"""
+    cases = " ".join(f"WHEN {expression} > {threshold} THEN {points}"
+                     for points, threshold in reversed(list(enumerate(thresholds, start=1))))
+    return f"(CASE {cases} ELSE 0 END)"
+
+def build_nutriscore_points_sql(columns, dialect="bigquery"):
+    """Expression SQL du score Nutri-Score, identique a compute_nutriscore (NULL si un nutriment manque)"""
+    q = partial(sql_identifier, dialect=dialect)
+
+    def converted(col, factor):
+        return f"ROUND({q(col)} * {factor}, 3)" if col in columns else "NULL"
+
+    negative = " + ".join(_nutriscore_points_sql(converted(col, factor), thresholds)
+                          for col, factor, thresholds in NUTRISCORE_NEGATIVE_POINTS)
+    fiber_col, fiber_factor, fiber_thresholds = NUTRISCORE_FIBER_POINTS
+    fiber = _nutriscore_points_sql(f"COALESCE({converted(fiber_col, fiber_factor)}, 0)", fiber_thresholds)
+    protein_col, protein_factor, protein_thresholds = NUTRISCORE_PROTEIN_POINTS
+    proteins = _nutriscore_points_sql(converted(protein_col, protein_factor), protein_thresholds)
+    required = [col for col, _, _ in NUTRISCORE_NEGATIVE_POINTS] + [protein_col]
+    if any(col not in columns for col in required):
+        return "NULL"
+    missing = " OR ".join(f"{q(col)} IS NULL" for col in required)
+    return (f"(CASE WHEN {missing} THEN NULL ELSE ({negative}) - {fiber} - "
+            f"(CASE WHEN ({negative}) >= {NUTRISCORE_PROTEIN_CAP} THEN 0 ELSE {proteins} END) END)")
+
+def build_nutriscore_grade_sql(points):
+    """Expression SQL de la lettre Nutri-Score d'un score"""
+    cases = " ".join(f"WHEN {points} <= {bound} THEN '{grade}'"
+                     for bound, grade in zip(NUTRISCORE_GRADE_BOUNDS, NUTRISCORE_GRADES))
+    return f"(CASE WHEN {points} IS NULL THEN NULL {cases} ELSE '{NUTRISCORE_GRADES[-1]}' END)"
+
+def build_transform_sql(source, dialect="bigquery", columns=None, where=None):
+    """Genere la requete SQL equivalente a transform_data pour la table source"""
+    if columns is None:
+        columns = [name for name, _, _ in EXTRACTION_FIELDS]
+    columns = list(columns)
+    missing = [col for col in ("product_name", "nutriscore_grade", "labels") if col not in columns]
+    if missing:
+        raise ValueError(f"Colonnes absentes de la source : {missing}")
+    q = partial(sql_identifier, dialect=dialect)
+    literal = partial(sql_literal, dialect=dialect)
+    text_columns = [col for col in columns if col in TRANSFORM_TEXT_COLUMNS]
+
+    def select(expression_for):
+        return ", ".join(
+            f"{expression_for(col)} AS {q(col)}" if col in text_columns else q(col) for col in columns
+        )
+
+    selected = []
+    for col in columns:
+        if col in TRANSFORM_NUMERIC_COLUMNS:
+            cast = f"SAFE_CAST({q(col)} AS FLOAT64)" if dialect == "bigquery" else f"CAST({q(col)} AS REAL)"
+            selected.append(f"{cast} AS {q(col)}")
+        elif col == "nutriscore_grade":
+            selected.append(f"UPPER(COALESCE({q(col)}, '')) AS {q(col)}")
+        elif col == "product_name":
+            selected.append(f"COALESCE({q(col)}, 'Inconnu') AS {q(col)}")
+        elif col in text_columns:
+            selected.append(f"LOWER(TRIM(COALESCE({q(col)}, ''))) AS {q(col)}")
+        else:
+            selected.append(q(col))
+    source_where = f" WHERE {where}" if where else ""
+    ctes = [f"selection AS (\n  SELECT {', '.join(selected)}\n  FROM {q(source)}{source_where}\n)"]
+
+    # Traductions par jointure des morceaux de texte avec la table de correspondance des termes
+    ctes.append(build_rewrite_terms_sql(dialect))
+    delimiters = literal(INITCAP_DELIMITERS)
+    normalised = select(lambda col: f"TRIM(INITCAP({build_rewrite_sql(q(col), dialect)}, {delimiters}))")
+    source_ctes = "selection CROSS JOIN termes" if dialect == "bigquery" else "selection"
+    ctes.append(f"normalise AS (\n  SELECT {normalised}\n  FROM {source_ctes}\n)")
+
+    # Memes filtres que transform_data : nom connu, au moins la moitie des colonnes et nutriments essentiels
+    non_null = " + ".join(f"(CASE WHEN {q(col)} IS NULL THEN 0 ELSE 1 END)" for col in columns)
+    filters = [f"LOWER({q('product_name')}) != 'inconnu'", f"({non_null}) >= {len(columns) * 0.5}"]
+    filters += [f"{q(col)} IS NOT NULL" for col in TRANSFORM_REQUIRED_COLUMNS if col in columns]
+
+    ctes.append(f"nutriscore AS (\n  SELECT *, {build_nutriscore_points_sql(columns, dialect)} AS nutriscore_points\n"
+                f"  FROM normalise\n)")
+
+    value = lambda col: f"COALESCE({q(col)}, 0)" if col in columns else "0"
+    contains = "STRPOS" if dialect == "bigquery" else "INSTR"
+    denominator = f"({value('proteins_100g')} + {value('fat_100g')} + {value('sugars_100g')})"
+    computed_grade = build_nutriscore_grade_sql("nutriscore_points")
+    api_grade = f"UPPER(TRIM({q('nutriscore_grade')}))"
+    valid_grade = (f"CASE WHEN {api_grade} IN ({', '.join(literal(grade) for grade in NUTRISCORE_GRADES)}) "
+                   f"THEN {api_grade} END")
+    grades = " ".join(f"WHEN {literal(grade)} THEN {literal(label)}"
+                      for grade, label in NUTRISCORE_CLASSIFICATIONS.items())
+    derived = [
+        f"{computed_grade} AS nutriscore_calcule",
+        f"COALESCE({contains}(LOWER({q('labels')}), 'bio') > 0, FALSE) AS has_label_bio",
+        f"{q('energy_kcal')} / (CASE WHEN {denominator} = 0 THEN 1 ELSE {denominator} END) AS nutrient_density",
+        f"{value('energy_kcal')} + {value('sugars_100g')} + {value('saturated_fat_100g')} - "
+        f"({value('proteins_100g')} + {value('fiber_100g')}) AS scoring_nutritionnel_personnalise",
+        f"CASE COALESCE({valid_grade}, {computed_grade}) {grades} ELSE 'Inconnu' END AS qualite_nutritionnelle",
+    ]
+
+    return (
+        "WITH " + ",\n".join(ctes) + "\n"
+        f"SELECT *, {', '.join(derived)}\n"
+        "FROM nutriscore\n"
+        f"WHERE {' AND '.join(filters)}"
+    )
+
+def transform_in_bigquery(source_table, target_table, active_only=False, client=None):
+    """Execute la transformation dans BigQuery vers une table transformee.
+    Retourne le nombre de lignes source et transformees (None en cas d'echec)"""
+    if client is None:
+        credentials_path = get_credentials_path()
+        if not credentials_path:
+            print("Impossible de transformer dans BigQuery : fichier de credentials non trouve")
+            return None
+
+    try:
+        if client is None:
+            client = bigquery.Client()
+        columns = [field.name for field in client.get_table(source_table).schema
+                   if not (active_only and field.name == "is_deleted")]
+        where = "is_deleted IS NOT TRUE" if active_only else None
+        sql = build_transform_sql(source_table, "bigquery", columns, where=where)
+        cluster = build_cluster_clause(get_clustering_fields(columns, get_table_layout()))
+        client.query(f"CREATE OR REPLACE TABLE `{target_table}` {cluster}AS\n{sql}").result()
+
+        source_filter = f" WHERE {where}" if where else ""
+        row = next(iter(client.query(
+            f"SELECT (SELECT COUNT(*) FROM `{source_table}`{source_filter}) AS source_rows, "
+            f"(SELECT COUNT(*) FROM `{target_table}`) AS transformed_rows"
+        ).result()))
+        counts = {"source_rows": int(row["source_rows"]), "transformed_rows": int(row["transformed_rows"])}
+        print(f"Transformation SQL : {counts['transformed_rows']} lignes sur {counts['source_rows']} "
+              f"ecrites dans {target_table}")
+        return counts
+    except Exception as e:
+        print(f"Erreur lors de la transformation dans BigQuery : {e}")
+        return None
+
+def _sqlite_initcap(value, delimiters):
+    return None if value is None else initcap(value, delimiters)
+
+def _sqlite_regexp_extract_all(value, pattern):
+    """REGEXP_EXTRACT_ALL de BigQuery, renvoye en tableau JSON (lu avec json_each)"""
+    return None if value is None else json.dumps(re.findall(pattern, value))
+
+def register_sqlite_functions(connection):
+    """Ajoute a une connexion SQLite les fonctions BigQuery utilisees par la transformation SQL"""
+    connection.create_function("INITCAP", 2, _sqlite_initcap, deterministic=True)
+    connection.create_function("REGEXP_EXTRACT_ALL", 2, _sqlite_regexp_extract_all, deterministic=True)
+    # LOWER et UPPER natifs de SQLite ne gerent que l'ASCII
+    connection.create_function("LOWER", 1, lambda value: None if value is None else str(value).lower(),
+                               deterministic=True)
+    connection.create_function("UPPER", 1, lambda value: None if value is None else str(value).upper(),
+                               deterministic=True)
+
+class Warehouse(ABC):
+    """Entrepot de donnees du pipeline : chargement des lots, lecture et transformation"""
+
+    dialect = None
+
+    @abstractmethod
+    def table_name(self, table_id):
+        """Retourne le nom complet d'une table de l'entrepot"""
+
+    @abstractmethod
+    def load(self, path, table, mode="truncate", soft_delete=False):
+        """Charge un fichier d'etape (mode truncate, append ou upsert).
+        Retourne les compteurs du chargement (None en cas d'echec)"""
+
+    @abstractmethod
+    def read_table(self, table, active_only=False, columns=None, where=None):
+        """Lit une table, limitee aux colonnes et lignes demandees"""
+
+    @abstractmethod
+    def transform(self, source_table, target_table, active_only=False):
+        """Execute la transformation SQL dans l'entrepot et retourne les nombres de lignes"""
+
+    @abstractmethod
+    def query(self, sql):
+        """Execute une requete et retourne le resultat en DataFrame"""
+
+class BigQueryWarehouse(Warehouse):
+    """Entrepot BigQuery"""
+
+    dialect = "bigquery"
+
+    def __init__(self, client=None):
+        self.client = client if client is not None else bigquery.Client()
+
+    def table_name(self, table_id):
+        return f"{PROJECT_ID}.{DATASET_ID}.{table_id}"
+
+    def load(self, path, table, mode="truncate", soft_delete=False):
+        if mode == "upsert":
+            return upsert_to_bigquery(path, table, soft_delete=soft_delete, client=self.client)
+        write_disposition = "WRITE_APPEND" if mode == "append" else "WRITE_TRUNCATE"
+        loaded = load_to_bigquery(path, table, write_disposition, client=self.client, layout=get_table_layout())
+        return {} if loaded else None
+
+    def read_table(self, table, active_only=False, columns=None, where=None):
+        return get_data_from_bigquery(table, active_only=active_only, columns=columns, where=where,
+                                      client=self.client)
+
+    def transform(self, source_table, target_table, active_only=False):
+        return transform_in_bigquery(source_table, target_table, active_only=active_only, client=self.client)
+
+    def query(self, sql):
+        return self.client.query(sql).result().to_arrow().to_pandas()
+
+class SQLiteWarehouse(Warehouse):
+    """Entrepot local SQLite : meme cycle que BigQuery, sans credentials ni reseau"""
+
+    dialect = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        register_sqlite_functions(self.connection)
+
+    def table_name(self, table_id):
+        return table_id
+
+    def _q(self, name):
+        return sql_identifier(name, "sqlite")
+
+    def columns(self, table):
+        """Colonnes d'une table (liste vide si elle n'existe pas)"""
+        return [row[1] for row in self.connection.execute(f"PRAGMA table_info({self._q(table)})")]
+
+    def _add_missing_columns(self, table, columns):
+        existing = self.columns(table)
+        for col in columns:
+            if col not in existing:
+                self.connection.execute(f"ALTER TABLE {self._q(table)} ADD COLUMN {self._q(col)}")
+
+    def load(self, path, table, mode="truncate", soft_delete=False):
+        try:
+            # Memes valeurs decimales que le chargement CSV
+            df = widen_float32_columns(read_stage(path))
+            if mode == "upsert":
+                counts = self._upsert(df, table, soft_delete)
+            else:
+                if mode == "append" and self.columns(table):
+                    self._add_missing_columns(table, df.columns)
+                df.to_sql(table, self.connection, index=False, chunksize=50000,
+                          if_exists="append" if mode == "append" else "replace")
+                counts = {"rows": len(df)}
+            self.connection.commit()
+            print(f"Donnees chargees dans SQLite : {table} ({self.path})")
+            return counts
+        except (sqlite3.Error, ValueError, OSError) as e:
+            self.connection.rollback()
+            print(f"Erreur lors du chargement dans SQLite : {e}")
+            return None
+
+    def _upsert(self, df, table, soft_delete):
+        q = self._q
+        if "code" not in df.columns:
+            raise ValueError("Fusion impossible : colonne code absente du lot")
+        staging = table + config['google_cloud'].get('staging_suffix', '_staging')
+        df.to_sql(staging, self.connection, index=False, chunksize=50000, if_exists="replace")
+        columns = list(df.columns)
+
+        if not self.columns(table):
+            self.connection.execute(
+                f"CREATE TABLE {q(table)} AS SELECT *, 0 AS is_deleted FROM {q(staging)} WHERE 0")
+        self._add_missing_columns(table, columns + ["is_deleted"])
+        index = table + "_code"
+        if index not in [row[1] for row in self.connection.execute(f"PRAGMA index_list({q(table)})")]:
+            # Une table remplie en mode truncate peut contenir plusieurs lignes par code :
+            # seule la premiere est gardee, comme pour le lot dedoublonne
+            removed = self.connection.execute(
+                f"DELETE FROM {q(table)} WHERE code IS NOT NULL AND rowid NOT IN "
+                f"(SELECT MIN(rowid) FROM {q(table)} WHERE code IS NOT NULL GROUP BY code)"
+            ).rowcount
+            if removed:
+                print(f"{removed} doublons de code supprimes de {table} avant la fusion")
+            self.connection.execute(f"CREATE UNIQUE INDEX {q(index)} ON {q(table)}(code)")
+
+        # Lot dedoublonne sur le code, comme pour le MERGE BigQuery
+        source = (f"(SELECT * FROM {q(staging)} WHERE rowid IN (SELECT MIN(rowid) FROM {q(staging)} "
+                  f"WHERE code IS NOT NULL AND code != '' GROUP BY code))")
+
+        def changed(target, batch):
+            checks = [f"{target}.{q(col)} IS NOT {batch}.{q(col)}" for col in columns if col != "code"]
+            return "(" + " OR ".join(checks + [f"{target}.is_deleted IS 1"]) + ")"
+
+        inserted, updated, unchanged = self.connection.execute(
+            f"SELECT COALESCE(SUM(T.code IS NULL), 0), "
+            f"COALESCE(SUM(T.code IS NOT NULL AND {changed('T', 'S')}), 0), "
+            f"COALESCE(SUM(T.code IS NOT NULL AND NOT {changed('T', 'S')}), 0) "
+            f"FROM {source} S LEFT JOIN {q(table)} T ON T.code = S.code"
+        ).fetchone()
+        deleted = 0
+        if soft_delete:
+            deleted = self.connection.execute(
+                f"SELECT COUNT(*) FROM {q(table)} WHERE is_deleted IS NOT 1 AND code NOT IN (SELECT code FROM {source})"
+            ).fetchone()[0]
+
+        column_list = ", ".join(q(col) for col in columns)
+        updates = ", ".join([f"{q(col)} = excluded.{q(col)}" for col in columns if col != "code"] + ["is_deleted = 0"])
+        self.connection.execute(
+            f"INSERT INTO {q(table)} ({column_list}, is_deleted) SELECT {column_list}, 0 FROM {source} WHERE TRUE "
+            f"ON CONFLICT(code) DO UPDATE SET {updates} WHERE {changed(q(table), 'excluded')}"
+        )
+        if soft_delete:
+            self.connection.execute(
+                f"UPDATE {q(table)} SET is_deleted = 1 WHERE is_deleted IS NOT 1 AND code NOT IN (SELECT code FROM {source})"
+            )
+        self.connection.execute(f"DROP TABLE {q(staging)}")
+
+        counts = {"inserted": inserted, "updated": updated, "unchanged": unchanged, "deleted": deleted}
+        print(f"Fusion dans {table} : {inserted} inseres, {updated} modifies, "
+              f"{unchanged} inchanges, {deleted} marques supprimes")
+        return counts
+
+    def read_table(self, table, active_only=False, columns=None, where=None):
+        available = [col for col in self.columns(table) if not (active_only and col == "is_deleted")]
+        columns = available if columns is None else [col for col in columns if col in available]
+        if callable(where):
+            where = where(columns)
+        if active_only:
+            where = f"({where}) AND is_deleted IS NOT 1" if where else "is_deleted IS NOT 1"
+        sql = f"SELECT {', '.join(self._q(col) for col in columns)} FROM {self._q(table)}"
+        if where:
+            sql += f" WHERE {where}"
+        df = pd.read_sql_query(sql, self.connection)
+        print(f"{len(df)} lignes lues depuis SQLite ({len(df.columns)} colonnes)")
+        return df
+
+    def transform(self, source_table, target_table, active_only=False):
+        try:
+            columns = [col for col in self.columns(source_table) if not (active_only and col == "is_deleted")]
+            where = "is_deleted IS NOT 1" if active_only else None
+            sql = build_transform_sql(source_table, "sqlite", columns, where=where)
+            self.connection.execute(f"DROP TABLE IF EXISTS {self._q(target_table)}")
+            self.connection.execute(f"CREATE TABLE {self._q(target_table)} AS {sql}")
+            self.connection.commit()
+            source_filter = f" WHERE {where}" if where else ""
+            counts = {
+                "source_rows": self.connection.execute(
+                    f"SELECT COUNT(*) FROM {self._q(source_table)}{source_filter}").fetchone()[0],
+                "transformed_rows": self.connection.execute(
+                    f"SELECT COUNT(*) FROM {self._q(target_table)}").fetchone()[0],
+            }
+            print(f"Transformation SQL : {counts['transformed_rows']} lignes sur {counts['source_rows']} "
+                  f"ecrites dans {target_table}")
+            return counts
+        except (sqlite3.Error, ValueError) as e:
+            self.connection.rollback()
+            print(f"Erreur lors de la transformation dans SQLite : {e}")
+            return None
+
+    def query(self, sql):
+        return pd.read_sql_query(sql, self.connection)
+
+def get_warehouse():
+    """Retourne l'entrepot configure (None pour BigQuery sans credentials ou sans connexion)"""
+    backend = config.get('warehouse', {}).get('backend', 'bigquery')
+    if backend == 'sqlite':
+        return SQLiteWarehouse(os.path.join(DATA_DIR, config['warehouse']['sqlite_filename']))
+    if backend != 'bigquery':
+        raise ValueError(f"Entrepot inconnu : {backend}")
+    if not get_credentials_path():
+        return None
+    try:
+        return BigQueryWarehouse()
+    except Exception as e:
+        # Comme avant l'entrepot : le pipeline continue avec les fichiers locaux
+        print(f"Erreur lors du chargement dans BigQuery : {e}")
+        return None
+
+def extract_products_from_api():
+    """Telecharge les pages manquantes en s'appuyant sur le checkpoint et retourne le DataFrame extrait"""
+    checkpoint_dir = get_checkpoint_dir(PAGE_SIZE)
+    completed = load_checkpoint(checkpoint_dir)
+    missing_pages = [page for page in range(1, NUM_PAGES + 1) if page not in completed]
+    if completed:
+        print(f"Reprise depuis le checkpoint : {len(completed)} pages deja extraites, {len(missing_pages)} a telecharger")
+
+    # En mode flux, les lignes sont extraites pendant la lecture de la reponse
+    stream_json = config['api'].get('stream_json', False)
+    fetch_page = fetch_product_rows if stream_json else fetch_products
+
+    failed_pages = []
+    print(f"Telechargement de {len(missing_pages)} pages ({MAX_WORKERS} en parallele, {REQUESTS_PER_SECOND} requetes/s max)")
+    for page, products in fetch_pages(missing_pages, PAGE_SIZE, fetch_page=fetch_page):
+        if products is None:
+            failed_pages.append(page)
+            continue
+        if not products:
+            print(f"Page {page} vide ou invalide. Passage a la suivante")
+        else:
+            print(f"Page {page}/{NUM_PAGES} telechargee : {len(products)} produits")
+        rows = products if stream_json else [extract_product_info(p) for p in products]
+        completed[page] = write_checkpoint_page(checkpoint_dir, page, rows)
+
+    if failed_pages:
+        print(f"Attention : {len(failed_pages)} page(s) en echec apres retries : {failed_pages}")
+        print("Extraction incomplete conservee dans le checkpoint. Relancez le pipeline pour recuperer les pages manquantes")
+        return None
+
+    accumulator = read_checkpoint_rows(completed)
+    df = accumulator.to_frame()
+    accumulator.clear()
+    print(f"{len(df)} produits extraits")
+    return df
+
+def _csv_row_to_product(row):
+    """Reconstruit un produit au format de l'API a partir d'une ligne de l'export CSV"""
+    product = {}
+    nutriments = {}
+    for key, value in row.items():
+        if key.endswith("_100g"):
+            nutriments[key] = value if value != "" else None
+        else:
+            product[key] = value
+    product["nutriments"] = nutriments
+    product.setdefault("nutrition_score_fr", nutriments.get("nutrition-score-fr_100g") or "")
+    return product
+
+def iter_dump_products(dump_path):
+    """Lit un export OpenFoodFacts (JSONL ou CSV, eventuellement gzip) produit par produit"""
+    is_gzip = dump_path.endswith(".gz")
+    base_path = dump_path[:-3] if is_gzip else dump_path
+    opener = gzip.open if is_gzip else open
+
+    if base_path.endswith((".jsonl", ".json", ".ndjson")):
+        skipped = 0
+        with opener(dump_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    skipped += 1
+        if skipped:
+            print(f"{skipped} lignes JSON invalides ignorees dans {dump_path}")
+        return
+
+    # L'export CSV officiel est separe par des tabulations et contient de tres longs champs
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    with opener(dump_path, "rt", encoding="utf-8", newline="") as f:
+        header_line = f.readline()
+        delimiter = "\t" if "\t" in header_line else ","
+        # L'export separe par tabulations n'est pas entre guillemets : un '"' isole fait partie du texte
+        quoting = csv.QUOTE_NONE if delimiter == "\t" else csv.QUOTE_MINIMAL
+        header = next(csv.reader([header_line], delimiter=delimiter, quoting=quoting))
+        for values in csv.reader(f, delimiter=delimiter, quoting=quoting):
+            yield _csv_row_to_product(dict(zip(header, values)))
+
+def ingest_dump(dump_path, output_path, chunk_size=None):
+    """Extrait un export complet par blocs de taille fixe et ecrit le CSV au fil de l'eau"""
+    if chunk_size is None:
+        chunk_size = config['api']['dump_chunk_size']
+    if not dump_path or not os.path.exists(dump_path):
+        print(f"Export OpenFoodFacts introuvable : {dump_path}")
+        return False
+
+    print(f"Lecture de l'export : {dump_path} (blocs de {chunk_size} produits)")
+    # Le CSV n'apparait sous son nom final qu'une fois complet
+    tmp_path = output_path + ".tmp"
+    read_count = 0
+    written_count = 0
+    # Le bloc est toujours ecrit avant le seuil de deversement
+    batch = ProductAccumulator(spill_rows=0)
+
+    def write_batch(rows, first):
+        df = clean_products_frame(rows.to_frame())
+        format_csv_floats(df).to_csv(tmp_path, mode="w" if first else "a", header=first,
+                  index=False, encoding="utf-8", quoting=1)
+        return len(df)
+
+    try:
+        for product in iter_dump_products(dump_path):
+            batch.append(product)
+            read_count += 1
+            if len(batch) >= chunk_size:
+                written_count += write_batch(batch, first=read_count == len(batch))
+                batch.clear()
+                print(f"{read_count} produits lus, {written_count} ecrits")
+        if batch:
+            written_count += write_batch(batch, first=read_count == len(batch))
+    except (OSError, EOFError, ValueError) as e:
+        print(f"Erreur lors de la lecture de l'export : {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    if read_count == 0:
+        print("Export vide : aucun produit extrait")
+        return False
+    os.replace(tmp_path, output_path)
+    mark_as_cleaned(output_path, rows=written_count)
+    print(f"{written_count} produits sur {read_count} ecrits dans {output_path}")
+    return True
+
+def run_streaming_extraction(csv_path, queue_size=None):
+    """Extraction en flux : telechargement, extraction/nettoyage et ecriture CSV se chevauchent"""
+    if queue_size is None:
+        queue_size = config['processing']['queue_size']
+    stream_json = config['api'].get('stream_json', False)
+    fetch_page = fetch_product_rows if stream_json else fetch_products
+
+    # Files bornees : la memoire est limitee a queue_size pages par etape
+    pages_queue = queue.Queue(maxsize=queue_size)
+    frames_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = object()
+    failed_pages = []
+    errors = []
+
+    def put(target, item):
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source):
+        while not stop.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return done
+
+    def fetch_stage():
+        try:
+            for page, products in fetch_pages(range(1, NUM_PAGES + 1), PAGE_SIZE, fetch_page=fetch_page):
+                if products is None:
+                    failed_pages.append(page)
+                    continue
+                if not put(pages_queue, (page, products)):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(pages_queue, done)
+
+    def clean_stage():
+        try:
+            while True:
+                item = get(pages_queue)
+                if item is done:
+                    break
+                page, products = item
+                rows = products if stream_json else [extract_product_info(p) for p in products]
+                df = clean_products_frame(pd.DataFrame(rows)) if rows else None
+                if not put(frames_queue, (page, len(rows), df)):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(frames_queue, done)
+
+    threads = [
+        threading.Thread(target=fetch_stage, name="fetch", daemon=True),
+        threading.Thread(target=clean_stage, name="clean", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # L'ecriture se fait dans le thread principal, dans l'ordre des pages
+    tmp_path = csv_path + ".tmp"
+    columns = None
+    written = 0
+    try:
+        while True:
+            item = get(frames_queue)
+            if item is done:
+                break
+            page, count, df = item
+            if df is None or df.empty:
+                print(f"Page {page} vide ou invalide. Passage a la suivante")
+                continue
+            if columns is None:
+                columns = list(df.columns)
+                format_csv_floats(df).to_csv(tmp_path, mode="w", index=False, encoding="utf-8", quoting=1)
+            else:
+                format_csv_floats(df[columns]).to_csv(tmp_path, mode="a", header=False, index=False, encoding="utf-8", quoting=1)
+            written += len(df)
+            print(f"Page {page}/{NUM_PAGES} : {count} produits, {len(df)} ecrits")
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    for thread in threads:
+        thread.join()
+
+    if errors or failed_pages or columns is None:
+        if errors:
+            print(f"Erreur dans le pipeline en flux : {errors[0]}")
+        if failed_pages:
+            print(f"Attention : {len(failed_pages)} page(s) en echec apres retries : {sorted(failed_pages)}")
+        if columns is None and not errors:
+            print("Aucun produit extrait")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    os.replace(tmp_path, csv_path)
+    mark_as_cleaned(csv_path, rows=written)
+    print(f"{written} produits ecrits en flux dans {csv_path}")
+    return True
+
+def get_delta_state_path():
+    """Retourne le chemin du fichier d'etat du mode delta"""
+    return os.path.join(DATA_DIR, config['files']['delta_state_filename'])
+
+def load_delta_state():
+    """Charge l'etat de la derniere extraction delta"""
+    path = get_delta_state_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Etat delta illisible ({e}) : extraction complete")
+        return {}
+
+def save_delta_state(state):
+    """Sauvegarde l'etat delta de facon atomique"""
+    path = get_delta_state_path()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    print(f"Etat delta sauvegarde : last_modified_t={state.get('last_modified_t')}")
+
+def extract_changed_products(state=None):
+    """Extrait les produits modifies depuis la derniere execution, dedoublonnes sur le code"""
+    if state is None:
+        state = load_delta_state()
+    high_water_mark = state.get("last_modified_t")
+    # Sans etat precedent, on se limite au meme volume que le mode complet
+    max_pages = config['api']['delta_max_pages'] if high_water_mark else NUM_PAGES
+    if high_water_mark:
+        print(f"Extraction delta des produits modifies depuis last_modified_t={high_water_mark}")
+    else:
+        print("Aucun etat delta : premiere extraction triee par date de modification")
+
+    if config['api'].get('stream_json', False):
+        fetch_page = partial(fetch_product_rows, sort_by="last_modified_t", extra_fields=("last_modified_t",))
+    else:
+        def fetch_page(page, page_size):
+            products = fetch_products(page, page_size, sort_by="last_modified_t", extra_fields=("last_modified_t",))
+            if products is None:
+                return None
+            rows = []
+            for product in products:
+                row = extract_product_info(product)
+                row["last_modified_t"] = product.get("last_modified_t")
+                rows.append(row)
+            return rows
+
+    rows_by_code = {}
+    new_high_water_mark = high_water_mark or 0
+    oldest_modified = None
+    reached_known = False
+    for page, rows in fetch_pages(range(1, max_pages + 1), PAGE_SIZE, fetch_page=fetch_page):
+        if rows is None:
+            print(f"Page {page} en echec : extraction delta interrompue, etat inchange")
+            return None, state
+        reached_known = not rows
+        for row in rows:
+            modified = row.pop("last_modified_t", None) or 0
+            # Les pages sont triees par date de modification decroissante
+            if high_water_mark and modified < high_water_mark:
+                reached_known = True
+                break
+            new_high_water_mark = max(new_high_water_mark, modified)
+            oldest_modified = modified
+            # Le premier exemplaire rencontre est le plus recent
+            rows_by_code.setdefault(row["code"], row)
+        print(f"Page {page} : {len(rows_by_code)} produits nouveaux ou modifies")
+        if reached_known:
+            break
+
+    if not reached_known and high_water_mark:
+        # Limite de pages atteinte avant l'ancienne marque : les pages non lues contiennent encore
+        # des produits modifies. La marque est conservee pour les relire au prochain passage
+        print(f"Extraction delta tronquee apres {max_pages} pages (produits jusqu'a last_modified_t="
+              f"{oldest_modified}) : marque conservee a {high_water_mark}, augmentez OPENFOODFACTS_DELTA_MAX_PAGES")
+        new_high_water_mark = high_water_mark
+
+    df = pd.DataFrame(list(rows_by_code.values()))
+    print(f"{len(df)} produits nouveaux ou modifies extraits")
+    new_state = dict(state, last_modified_t=new_high_water_mark, last_run=int(time.time()))
+    return df, new_state
+
 def main():
     """Pipeline principal"""
-    if not check_api_connection():
+    extraction_mode = config['api'].get('extraction_mode', 'full')
+    if extraction_mode != 'dump' and not check_api_connection():
         print("Arret du pipeline car l'API OpenFoodFacts est injoignable")
         return
 
-    # Chemins des fichiers
-    csv_path = get_csv_path(config['files']['csv_original_filename'])
-    cleaned_csv_path = get_csv_path(config['files']['csv_cleaned_filename'])
-    transformed_csv_path = get_csv_path(config['files']['csv_transformed_filename'])
+    # Chemins des fichiers : l'export et le flux produisent un CSV brut, ecrit au fil de l'eau
+    streamed = extraction_mode == 'dump' or (
+        extraction_mode != 'delta' and config['processing'].get('pipeline_mode') == 'streaming')
+    csv_path = get_stage_path(config['files']['csv_original_filename'], 'csv' if streamed else None)
+    cleaned_csv_path = get_stage_path(config['files']['csv_cleaned_filename'])
+    transformed_csv_path = get_stage_path(config['files']['csv_transformed_filename'])
+
+    delta_state = None
+
+    # En mode delta, on extrait toujours les produits modifies depuis la derniere execution
+    if extraction_mode == 'delta':
+        df, delta_state = extract_changed_products()
+        if df is None:
+            return
+        if df.empty:
+            print("Aucun produit modifie depuis la derniere execution")
+            save_delta_state(delta_state)
+            return
+
+        # Le DataFrame nettoye est transmis en memoire : chaque fichier est ecrit une seule fois
+        cleaned_df = save_to_csv(df, csv_path)
+        write_stage(cleaned_df, cleaned_csv_path, source_path=csv_path)
 
     # Verifier si un fichier CSV existe deja
-    if os.path.exists(csv_path):
+    elif os.path.exists(csv_path):
         print(f"Fichier CSV existant trouve : {csv_path}")
-        print("Nettoyage du fichier CSV existant")
-        cleaned_df = clean_csv_file(csv_path, cleaned_csv_path)
-        if cleaned_df is not None:
-            print("Fichier CSV nettoye avec succes")
+        if is_marked_cleaned(cleaned_csv_path, source_path=csv_path):
+            print(f"Fichier nettoye deja a jour : {cleaned_csv_path}")
+        elif is_parquet_path(csv_path) or is_parquet_path(cleaned_csv_path):
+            if clean_stage_file(csv_path, cleaned_csv_path) is not None:
+                print("Fichier nettoye avec succes")
+            else:
+                print("Echec du nettoyage du fichier existant")
+        elif config['processing'].get('workers', 1) > 1:
+            if clean_csv_file_parallel(csv_path, cleaned_csv_path) is not None:
+                print("Fichier CSV nettoye avec succes")
+            else:
+                print("Echec du nettoyage du fichier CSV existant")
+        elif config['processing'].get('clean_chunksize'):
+            if clean_csv_file_chunked(csv_path, cleaned_csv_path) is not None:
+                print("Fichier CSV nettoye avec succes")
+            else:
+                print("Echec du nettoyage du fichier CSV existant")
         else:
-            print("Echec du nettoyage du fichier CSV existant")
+            print("Nettoyage du fichier CSV existant")
+            cleaned_df = clean_csv_file(csv_path, cleaned_csv_path)
+            if cleaned_df is not None:
+                print("Fichier CSV nettoye avec succes")
+            else:
+                print("Echec du nettoyage du fichier CSV existant")
     else:
-        print("Aucun fichier CSV existant trouve. Telechargement des donnees")
-        
-        all_products = []
-        for page in range(1, NUM_PAGES + 1):
-            print(f"Telechargement page {page}/{NUM_PAGES}")
-            products = fetch_products(page, PAGE_SIZE)
-            if not products:
-                print(f"Page {page} vide ou invalide. Passage a la suivante")
-                continue
-            all_products.extend([extract_product_info(p) for p in products])
-            time.sleep(1)
+        if extraction_mode == 'dump':
+            print("Aucun fichier CSV existant trouve. Extraction depuis l'export OpenFoodFacts")
+            if not ingest_dump(config['api']['dump_path'], csv_path):
+                return
+            publish_cleaned_stage(csv_path, cleaned_csv_path)
+        elif config['processing'].get('pipeline_mode') == 'streaming':
+            print("Aucun fichier CSV existant trouve. Telechargement et nettoyage en flux")
+            if not run_streaming_extraction(csv_path):
+                return
+            publish_cleaned_stage(csv_path, cleaned_csv_path)
+        else:
+            print("Aucun fichier CSV existant trouve. Telechargement des donnees")
 
-        df = pd.DataFrame(all_products)
-        print(f"{len(df)} produits extraits")
+            df = extract_products_from_api()
+            if df is None:
+                return
 
-        save_to_csv(df, csv_path)
-        
-        # Nettoyer le fichier CSV fraichement cree
-        print("Nettoyage du fichier CSV telecharge")
-        cleaned_df = clean_csv_file(csv_path, cleaned_csv_path)
-        if cleaned_df is None:
-            print("Echec du nettoyage, utilisation du fichier original")
-            cleaned_df = df
+            # Le DataFrame nettoye est transmis en memoire : chaque fichier est ecrit une seule fois
+            cleaned_df = save_to_csv(df, csv_path)
+            write_stage(cleaned_df, cleaned_csv_path, source_path=csv_path)
+            clear_checkpoint(get_checkpoint_dir(PAGE_SIZE))
     
-    # Charger dans BigQuery
-    credentials_path = get_credentials_path()
-    if credentials_path:
+    # Charger dans l'entrepot de donnees (BigQuery ou SQLite local)
+    warehouse = get_warehouse()
+    if warehouse is not None:
         # Utiliser le fichier nettoye s'il existe, sinon le fichier original
         file_to_load = cleaned_csv_path if os.path.exists(cleaned_csv_path) else csv_path
-        load_to_bigquery(file_to_load, BQ_TABLE)
+        table = warehouse.table_name(TABLE_ID)
+        # Le lot delta ne contient que les produits modifies : il est fusionne dans la table
+        upsert = extraction_mode == 'delta' or config['google_cloud'].get('write_mode') == 'upsert'
+        # Un lot delta est partiel : les produits absents ne sont pas supprimes
+        soft_delete = upsert and extraction_mode != 'delta' and config['google_cloud'].get('soft_delete', False)
+        loaded = warehouse.load(file_to_load, table, mode="upsert" if upsert else "truncate",
+                                soft_delete=soft_delete) is not None
+        if loaded and delta_state is not None:
+            save_delta_state(delta_state)
         
+        if config['google_cloud'].get('transform_mode') == 'sql':
+            # La transformation reste dans l'entrepot : seuls les compteurs reviennent
+            warehouse.transform(table, warehouse.table_name(TRANSFORMED_TABLE_ID), active_only=upsert)
+            return
+
         try:
-            bq_df = get_data_from_bigquery(BQ_TABLE)
+            # Toutes les colonnes sont lues, comme dans la transformation SQL : seul le filtre
+            # des lignes est execute par l'entrepot
+            bq_df = warehouse.read_table(table, active_only=upsert, where=transform_predicate)
             if not bq_df.empty:
-                transformed_df = transform_data(bq_df)
-                transformed_df.to_csv(transformed_csv_path, index=False)
+                transformed_df = run_frame_in_parallel(bq_df, transform_data)
+                if is_parquet_path(transformed_csv_path):
+                    write_parquet(transformed_df, transformed_csv_path)
+                    if config['files'].get('export_csv'):
+                        transformed_df.to_csv(os.path.splitext(transformed_csv_path)[0] + ".csv", index=False)
+                else:
+                    transformed_df.to_csv(transformed_csv_path, index=False)
                 print(f"Donnees transformees sauvegardees : {transformed_csv_path}")
+                save_nutriscore_disagreements(transformed_df, transformed_csv_path)
         except Exception as e:
-            print(f"Erreur lors de la recuperation depuis BigQuery : {e}")
+            print(f"Erreur lors de la recuperation depuis l'entrepot : {e}")
     else:
-        print("Pipeline termine sans chargement BigQuery (credentials manquants)")
+        if delta_state is not None:
+            save_delta_state(delta_state)
+        print("Pipeline termine sans chargement BigQuery (credentials manquants ou connexion impossible)")
 
 if __name__ == "__main__":
     # Configuration des credentials
@@ -24,7 +24,8 @@ except ImportError:
             'data_directory': 'data',
             'csv_original_filename': 'openfood_referentiel.csv',
             'csv_cleaned_filename': 'openfood_referentiel_cleaned.csv',
-            'csv_transformed_filename': 'openfood_transformed.csv'
+            'csv_transformed_filename': 'openfood_transformed.csv',
+            'storage_format': 'csv'
         },
         'credentials_path': None
     }
@@ -62,6 +63,54 @@ def get_csv_path(filename):
     """Retourne le chemin complet pour un fichier CSV dans le dossier data"""
     return os.path.join(DATA_DIR, filename)
 
+def get_stage_path(filename):
+    """Retourne le chemin d'un fichier d'etape dans le format de stockage configure"""
+    if config['files'].get('storage_format', 'csv') == 'parquet':
+        return os.path.splitext(get_csv_path(filename))[0] + '.parquet'
+    return get_csv_path(filename)
+
+def read_stage_file(path):
+    """Charge un fichier d'etape CSV ou Parquet avec le schema commun des produits"""
+    from openfoodfacts_pipeline import read_stage
+    return read_stage(path)
+
+class FakeBigQueryJob:
+    """Job BigQuery factice : result() renvoie le resultat prevu"""
+    def __init__(self, result=None):
+        self._result = result
+    
+    def result(self):
+        return self._result
+
+class FakeBigQueryClient:
+    """Client BigQuery local pour les tests : enregistre les chargements, les requetes et les suppressions.
+    tables associe un identifiant a sa table (a defaut, schema du dernier chargement) ;
+    answer(sql) renvoie le resultat d'une requete (aucune ligne par defaut)"""
+    def __init__(self, tables=None, answer=None):
+        self.tables = tables or {}
+        self.answer = answer
+        self.loads = []
+        self.queries = []
+        self.deleted = []
+    
+    def load_table_from_file(self, source_file, table_id, job_config=None):
+        self.loads.append((table_id, job_config, source_file.read()))
+        return FakeBigQueryJob()
+    
+    def get_table(self, table_id):
+        if table_id in self.tables:
+            return self.tables[table_id]
+        table = bigquery.Table(table_id)
+        table.schema = self.loads[-1][1].schema
+        return table
+    
+    def query(self, sql):
+        self.queries.append(sql)
+        return FakeBigQueryJob(self.answer(sql) if self.answer else [])
+    
+    def delete_table(self, table_id, not_found_ok=False):
+        self.deleted.append(table_id)
+
 def test_csv_loading(csv_path):
     """Teste le chargement du fichier CSV"""
     print(f"Test de chargement du fichier CSV : {csv_path}")
@@ -71,8 +120,8 @@ def test_csv_loading(csv_path):
         return False
     
     try:
-        # Charger le fichier CSV
-        df = pd.read_csv(csv_path, encoding='utf-8', on_bad_lines='skip')
+        # Charger le fichier
+        df = read_stage_file(csv_path)
         print(f"Fichier CSV charge avec succes : {len(df)} lignes")
         
         # Verifier les colonnes
@@ -125,7 +174,7 @@ def test_data_quality(csv_path):
         return False
     
     try:
-        df = pd.read_csv(csv_path, encoding='utf-8', on_bad_lines='skip')
+        df = read_stage_file(csv_path)
         
         # Verifier les valeurs manquantes
         missing_data = df.isnull().sum()
@@ -152,6 +201,562 @@ def test_data_quality(csv_path):
         print(f"Erreur lors du test de qualite : {e}")
         return False
 
+def test_json_stream_chunks():
+    """Teste le decodage incremental du JSON decoupe en morceaux aleatoires"""
+    print("Test du decodage JSON par morceaux")
+    
+    try:
+        import json
+        import random
+        from openfoodfacts_pipeline import iter_json_array_items
+        
+        body = json.dumps({
+            "count": 2.5e3,
+            "products": [1, 2.5, -3e-2, 1234567.125, True, None, "caf\u00e9 \u20ac",
+                         {"code": "0012345678905", "nutriments": {"salt_100g": 1.25, "fat": [0.5, 10]}},
+                         "سلطان", 6.02e23],
+            "page": 1.0,
+        }, ensure_ascii=False).encode("utf-8")
+        expected = json.loads(body)["products"]
+        
+        rng = random.Random(42)
+        failures = 0
+        for _ in range(300):
+            # Coupures aleatoires, y compris au milieu d'un nombre ou d'un caractere UTF-8
+            cuts = sorted(rng.sample(range(1, len(body)), rng.randint(1, 20)))
+            chunks = [body[start:end] for start, end in zip([0] + cuts, cuts + [len(body)])]
+            if list(iter_json_array_items(chunks)) != expected:
+                failures += 1
+        # Un octet par morceau : chaque nombre est coupe
+        if list(iter_json_array_items(body[i:i + 1] for i in range(len(body)))) != expected:
+            failures += 1
+        
+        print(f"{failures} decoupages en erreur")
+        return failures == 0
+        
+    except Exception as e:
+        print(f"Erreur lors du test de decodage JSON : {e}")
+        return False
+
+def test_offline_cache_not_throttled():
+    """Teste qu'une relecture hors ligne depuis le cache n'est pas limitee en debit"""
+    print("Test de la relecture du cache sans limitation de debit")
+    
+    try:
+        import io
+        import json
+        import tempfile
+        import time
+        import requests
+        import openfoodfacts_pipeline as pipeline
+        
+        url = f"{pipeline.config['api']['url']}/cgi/search.pl"
+        previous_client = pipeline._http_client
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = pipeline.HttpCache(tmp_dir, mode="offline")
+            for page in range(1, 6):
+                response = requests.Response()
+                response.status_code = 200
+                response.url = url
+                response.raw = io.BytesIO(json.dumps({"products": [{"code": str(page)}]}).encode("utf-8"))
+                cache.store(cache.key(url, pipeline.get_search_params(page, 10)), response)
+            
+            # 1 requete/s : cinq pages reseau prendraient au moins quatre secondes
+            pipeline._http_client = pipeline.OpenFoodFactsClient(cache=cache, requests_per_second=1)
+            try:
+                start = time.monotonic()
+                pages = list(pipeline.fetch_pages(range(1, 6), 10, max_workers=2))
+                elapsed = time.monotonic() - start
+            finally:
+                pipeline._http_client.session.close()
+                pipeline._http_client = previous_client
+        
+        print(f"{len(pages)} pages relues en {elapsed:.2f}s")
+        return [products[0]["code"] for _, products in pages] == ["1", "2", "3", "4", "5"] and elapsed < 1
+        
+    except Exception as e:
+        print(f"Erreur lors du test du cache hors ligne : {e}")
+        return False
+
+def test_dump_stray_quote():
+    """Teste la lecture d'un export TSV dont un champ commence par un guillemet isole"""
+    print("Test de l'export TSV avec un guillemet isole")
+    
+    try:
+        import gzip
+        import tempfile
+        from openfoodfacts_pipeline import iter_dump_products
+        
+        lines = [
+            "code\tproduct_name\tbrands\tenergy-kcal_100g",
+            "0012345678905\tPain complet\tCarrefour\t250",
+            '2\t"Lait demi-ecreme\tLactel\t46',
+            "3\tSoda\tCoca\t42",
+            '4\tChips 12" extra\tLay\'s\t536',
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dump_path = os.path.join(tmp_dir, "export.csv.gz")
+            with gzip.open(dump_path, "wt", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            products = list(iter_dump_products(dump_path))
+        
+        print(f"{len(products)} produits lus")
+        return (
+            [product["code"] for product in products] == ["0012345678905", "2", "3", "4"]
+            and products[1]["product_name"] == '"Lait demi-ecreme'
+            and products[3]["product_name"] == 'Chips 12" extra'
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test de l'export TSV : {e}")
+        return False
+
+def test_warehouse_without_connection():
+    """Teste que le pipeline continue sans entrepot si le client BigQuery ne peut pas etre cree"""
+    print("Test de l'entrepot BigQuery sans connexion")
+    
+    try:
+        import openfoodfacts_pipeline as pipeline
+        
+        def failing_client(*args, **kwargs):
+            raise RuntimeError("identifiants invalides")
+        
+        saved = pipeline.bigquery.Client, pipeline.get_credentials_path, pipeline.config.get('warehouse')
+        pipeline.bigquery.Client = failing_client
+        pipeline.get_credentials_path = lambda: "credentials.json"
+        pipeline.config['warehouse'] = {**(saved[2] or {}), 'backend': 'bigquery'}
+        try:
+            warehouse = pipeline.get_warehouse()
+        finally:
+            pipeline.bigquery.Client, pipeline.get_credentials_path, pipeline.config['warehouse'] = saved
+        
+        return warehouse is None
+        
+    except Exception as e:
+        print(f"Erreur lors du test de l'entrepot sans connexion : {e}")
+        return False
+
+def test_clean_text_vectorized():
+    """Teste l'equivalence entre clean_text et sa version vectorisee"""
+    print("Test d'equivalence du nettoyage vectorise")
+    
+    try:
+        from openfoodfacts_pipeline import clean_text, clean_text_series
+        
+        samples = [
+            None, float('nan'), pd.NA, "", "   ", 42, 3.5, True,
+            'Chocolat "noir" 70%', "ligne 1\nligne 2\r\tfin", "a\x00b\x1fc\x7fd\x9fe",
+            "  espaces   multiples  ", "insecable\xa0et\u2009fin\u3000", "\u2028separateur",
+            "سلطان  الراية", "x" * 999, "y" * 1000, "z" * 1001, " " + "w " * 700,
+        ]
+        series = pd.Series(samples, dtype=object)
+        expected = [clean_text(value) for value in samples]
+        result = clean_text_series(series).tolist()
+        
+        differences = [(value, exp, res) for value, exp, res in zip(samples, expected, result) if exp != res]
+        for value, exp, res in differences:
+            print(f"  - {value!r}: attendu {exp!r}, obtenu {res!r}")
+        print(f"{len(samples) - len(differences)}/{len(samples)} valeurs identiques")
+        
+        return not differences
+        
+    except Exception as e:
+        print(f"Erreur lors du test de nettoyage vectorise : {e}")
+        return False
+
+def test_invalid_nutrients_cleaning():
+    """Teste que les trois nettoyages acceptent une valeur non numerique dans une colonne de nutriments"""
+    print("Test du nettoyage avec des nutriments invalides")
+    
+    try:
+        import tempfile
+        import openfoodfacts_pipeline as pipeline
+        
+        df = pd.DataFrame({
+            "code": ["0012345678905", "2", "3"],
+            "product_name": ["Pain", "Lait", "Soda"],
+            "brands": ["Carrefour", "Lactel", "Coca"],
+            "energy_kcal": ["250", "abc", "42.5"],
+            "salt_100g": ["1.1", "0.1", "n/a"],
+        })
+        engine = pipeline.config['processing'].get('csv_engine')
+        results = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = os.path.join(tmp_dir, "produits.csv")
+            df.to_csv(source, index=False)
+            # Lecture complete par les deux moteurs, puis par blocs (sequentiel et parallele)
+            for csv_engine in ("pyarrow", "c"):
+                pipeline.config['processing']['csv_engine'] = csv_engine
+                cleaned = pipeline.clean_csv_file(source, os.path.join(tmp_dir, f"{csv_engine}.csv"))
+                results.append(None if cleaned is None else len(cleaned))
+            pipeline.config['processing']['csv_engine'] = engine
+            results.append(pipeline.clean_csv_file_chunked(source, os.path.join(tmp_dir, "blocs.csv"), chunksize=2))
+            results.append(pipeline.clean_csv_file_parallel(source, os.path.join(tmp_dir, "parallele.csv"),
+                                                            workers=2, chunksize=2))
+            values = pipeline.read_products_csv(os.path.join(tmp_dir, "blocs.csv"))
+        
+        print(f"Lignes conservees : {results}")
+        return (
+            results == [3, 3, 3, 3]
+            and str(values["energy_kcal"].dtype) == "float32"
+            and values["energy_kcal"].isna().tolist() == [False, True, False]
+            and values["salt_100g"].isna().tolist() == [False, False, True]
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test des nutriments invalides : {e}")
+        return False
+
+def test_csv_parquet_stages():
+    """Teste que les etapes CSV et Parquet relisent les memes valeurs, textes vides compris"""
+    print("Test des etapes CSV et Parquet")
+    
+    try:
+        import tempfile
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from openfoodfacts_pipeline import read_stage, write_stage
+        
+        df = pd.DataFrame({
+            "code": ["0012345678905", "2", "3"],
+            "product_name": ["Pain", "", None],
+            "brands": pd.Categorical(["Carrefour", "", "Lactel"]),
+            "stores": pd.Categorical([None, None, None]),
+            "energy_kcal": pd.Series([250.0, 46.0, None], dtype="float32"),
+            "salt_100g": [None, None, None],
+            "score_derive": [1, 2, 3],
+        })
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            relus = {}
+            for extension in ("csv", "parquet"):
+                path = os.path.join(tmp_dir, f"etape.{extension}")
+                write_stage(df, path)
+                relus[extension] = read_stage(path)
+            schema = pq.read_schema(os.path.join(tmp_dir, "etape.parquet"))
+        
+        # Schema fixe des colonnes produit, meme toutes vides ; colonne derivee inferee
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        expected = {"code": pa.string(), "product_name": pa.string(), "brands": dictionary, "stores": dictionary,
+                    "energy_kcal": pa.float32(), "salt_100g": pa.float32(), "score_derive": pa.int64()}
+        if {name: schema.field(name).type for name in expected} != expected:
+            print(f"Schema Parquet inattendu : {schema}")
+            return False
+        
+        csv_df, parquet_df = relus["csv"], relus["parquet"]
+        print(f"Noms relus : CSV {csv_df['product_name'].tolist()}, Parquet {parquet_df['product_name'].tolist()}")
+        return all(
+            csv_df[col].astype(object).isna().tolist() == parquet_df[col].astype(object).isna().tolist()
+            for col in df.columns
+        ) and csv_df["code"].tolist() == parquet_df["code"].tolist()
+        
+    except Exception as e:
+        print(f"Erreur lors du test des etapes CSV et Parquet : {e}")
+        return False
+
+def test_bigquery_parquet_load():
+    """Teste le chargement Parquet type vers BigQuery avec un client factice"""
+    print("Test du chargement Parquet avec schema explicite")
+    
+    try:
+        import io
+        import tempfile
+        from openfoodfacts_pipeline import load_to_bigquery, write_products_csv
+        
+        client = FakeBigQueryClient()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_file = os.path.join(tmp_dir, "produits.csv")
+            df = pd.DataFrame({
+                "product_name": ["Pain", "Lait"],
+                "brands": ["Carrefour", ""],
+                "energy_kcal": [250.5, None],
+                "salt_100g": [0.1, 1.3],
+                "code": ["0012345678905", "3017620422003"],
+            })
+            write_products_csv(df, csv_file)
+            if not load_to_bigquery(csv_file, "projet.dataset.table", client=client, load_format="parquet"):
+                return False
+            # Partition de l'execution 25 (plage 20-30) remplacee seule, table clusterisee
+            layout = {"partitioning": "run_id", "partition_overwrite": True, "run_id": 25,
+                      "run_id_range": [0, 100, 10], "clustering_fields": ["nutriscore_grade", "brands", "code"]}
+            if not load_to_bigquery(csv_file, "projet.dataset.table", client=client, layout=layout):
+                return False
+        
+        _, job_config, payload = client.loads[0]
+        destination, partitioned_config, partitioned_payload = client.loads[1]
+        schema_types = {field.name: field.field_type for field in job_config.schema}
+        print(f"Format : {job_config.source_format}, schema : {schema_types}")
+        uploaded = pd.read_parquet(io.BytesIO(payload))
+        
+        return (
+            job_config.source_format == "PARQUET"
+            and schema_types == {"product_name": "STRING", "brands": "STRING", "energy_kcal": "FLOAT",
+                                 "salt_100g": "FLOAT", "code": "STRING"}
+            and uploaded["code"].tolist() == ["0012345678905", "3017620422003"]
+            and str(uploaded["energy_kcal"].dtype) == "float64"
+            # Memes valeurs decimales que le CSV, pas l'elargissement binaire du float32
+            and uploaded["salt_100g"].tolist() == [0.1, 1.3]
+            and destination == "projet.dataset.table$20"
+            and partitioned_config.range_partitioning.field == "run_id"
+            and partitioned_config.clustering_fields == ["brands", "code"]
+            and pd.read_parquet(io.BytesIO(partitioned_payload))["run_id"].tolist() == [25, 25]
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test de chargement Parquet : {e}")
+        return False
+
+def test_bigquery_upsert():
+    """Teste la fusion (staging puis MERGE sur code) vers BigQuery avec un client factice"""
+    print("Test de la fusion BigQuery")
+    
+    try:
+        import tempfile
+        from openfoodfacts_pipeline import upsert_to_bigquery, write_products_csv
+        
+        def answer(sql):
+            if sql.startswith("SELECT COUNTIF"):
+                return [{"inserted": 1, "updated": 1, "unchanged": 0, "deleted": 2}]
+            if sql.startswith("SELECT COUNT(code)"):
+                return [{"duplicates": 3}]
+            return []
+        
+        # Cible existante creee par un chargement CSV a schema detecte : code INTEGER
+        target = bigquery.Table("projet.dataset.produits")
+        target.schema = [bigquery.SchemaField("code", "INTEGER"), bigquery.SchemaField("product_name", "STRING"),
+                         bigquery.SchemaField("energy_kcal", "FLOAT")]
+        target.clustering_fields = ["code"]
+        client = FakeBigQueryClient(tables={"projet.dataset.produits": target}, answer=answer)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_file = os.path.join(tmp_dir, "lot.csv")
+            write_products_csv(pd.DataFrame({
+                "code": ["0012345678905", "3017620422003"],
+                "product_name": ["Pain", "Lait"],
+                "energy_kcal": [250.0, 46.0],
+            }), csv_file)
+            counts = upsert_to_bigquery(csv_file, "projet.dataset.produits", soft_delete=True, client=client)
+        
+        staging_id, job_config, _ = client.loads[0]
+        schema_types = {field.name: field.field_type for field in job_config.schema}
+        prepare, cast, duplicates_sql, dedupe, count_sql, merge = client.queries
+        print(f"Compteurs : {counts}")
+        
+        return (
+            counts == {"inserted": 1, "updated": 1, "unchanged": 0, "deleted": 2}
+            # Lot charge en Parquet type : le code reste du texte
+            and staging_id == "projet.dataset.produits_staging"
+            and job_config.source_format == "PARQUET" and schema_types["code"] == "STRING"
+            # Types GoogleSQL dans le DDL
+            and "`energy_kcal` FLOAT64" in prepare and "ADD COLUMN IF NOT EXISTS is_deleted BOOL" in prepare
+            and "FLOAT," not in prepare and "CLUSTER BY `code`" in prepare
+            # Code INTEGER de la cible converti en texte, clustering conserve
+            and cast.startswith("CREATE OR REPLACE TABLE `projet.dataset.produits` CLUSTER BY `code` AS")
+            and "SELECT * REPLACE (CAST(code AS STRING) AS code)" in cast
+            # Doublons de la cible supprimes avant les compteurs et le MERGE
+            and "COUNT(DISTINCT code)" in duplicates_sql
+            and "QUALIFY ROW_NUMBER() OVER (PARTITION BY code) = 1" in dedupe
+            and "DELETE FROM `projet.dataset.produits`" in dedupe
+            and "LEFT JOIN `projet.dataset.produits` T ON T.code = S.code" in count_sql
+            and "T.`energy_kcal` IS DISTINCT FROM S.`energy_kcal`" in merge
+            and "WHEN NOT MATCHED BY SOURCE AND T.is_deleted IS NOT TRUE THEN" in merge
+            and "QUALIFY ROW_NUMBER() OVER (PARTITION BY code) = 1" in merge
+            and client.deleted == [staging_id]
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test de fusion BigQuery : {e}")
+        return False
+
+def test_sql_transformation():
+    """Teste l'equivalence entre transform_data et la requete SQL generee, sur SQLite"""
+    print("Test d'equivalence de la transformation SQL")
+    
+    try:
+        import sqlite3
+        from openfoodfacts_pipeline import build_transform_sql, register_sqlite_functions, transform_data
+        
+        df = pd.DataFrame({
+            "product_name": ["Pain complet", None, "Inconnu", "Lait demi-ecreme", "Soda", "Yaourt", "Chips",
+                             "Biscuits", "Compote", "Muesli"],
+            "brands": ["carrefour", "lidl", "", "سلطان", None, "MONOPRIX bio", "l'atelier 3d",
+                       "l’atelier", "«bio»", "سلطانbio"],
+            "stores": ["auchan, leclerc", "", "lidl", "كارفور", "Monoprix", None, "auchan",
+                       "café–bio", "straße", "auchan leclerc"],
+            "nutriscore_grade": ["a", "b", "c", None, "e", "unknown", " d ", "c", "a", "b"],
+            "energy_kcal": [250.0, 40.0, 100.0, 46.0, 42.0, None, 536.0, 480.0, 70.0, 370.0],
+            "fat_100g": [3.5, 1.0, 2.0, 1.5, 0.0, 3.0, 34.0, 20.0, 0.2, 6.0],
+            "saturated_fat_100g": [0.5, 0.3, 1.0, 1.0, 0.0, 2.0, 3.1, 9.0, 0.1, 1.0],
+            "sugars_100g": [2.0, 4.0, 5.0, 4.8, 0.0, 4.0, 0.6, 30.0, 14.0, 20.0],
+            "salt_100g": [1.1, 0.1, None, 0.1, 0.02, 0.1, 1.3, 0.5, 0.0, 0.1],
+            "fiber_100g": [6.0, 0.0, 1.0, 0.0, 0.0, 0.0, 4.4, 2.0, 1.5, 7.0],
+            "proteins_100g": [9.0, 3.3, 2.0, 3.2, 0.0, 4.0, 6.5, 6.0, 0.3, 10.0],
+            # Termes composes : remplaces seulement s'ils forment un mot entier
+            "labels": ["Organic, vegan", "en:organic", None, "Bio", "", "halal", "non-gmo",
+                       "gluten-freex", "sans-gluten-free", "organic_bio, vegan2"],
+            "origins": ["france", "Spain", None, "italy", "germany", "", "France", "ß", "françe", "italy’s"],
+            "categories": ["beverages, sodas", "ready-meals", "snacks", "dairies", None, "desserts", "snacks",
+                           "snacks—desserts", "« desserts »", "cereals/breakfasts"],
+            "url": [f"https://example.org/{i}" for i in range(10)],
+            "code": ["0012345678905", "2", "3", "4", "5", "6", "7", "8", "9", "10"],
+        })
+        expected = transform_data(df.copy()).reset_index(drop=True)
+        
+        with sqlite3.connect(":memory:") as connection:
+            register_sqlite_functions(connection)
+            df.to_sql("produits", connection, index=False)
+            result = pd.read_sql(build_transform_sql("produits", "sqlite", df.columns), connection)
+        
+        result["has_label_bio"] = result["has_label_bio"].astype(bool)
+        # Ponctuation Unicode comme delimiteur de mots, meme regle en pandas et en SQL
+        print(f"Marques normalisees : {expected['brands'].tolist()}")
+        if not {"L’Atelier", "«Bio»"} <= set(expected["brands"]) or "Café–Bio" not in set(expected["stores"]):
+            return False
+        for col in expected.columns:
+            if str(expected[col].dtype) == "category":
+                expected[col] = expected[col].astype(object)
+        print(f"{len(result)} lignes en SQL, {len(expected)} lignes en pandas")
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        return True
+        
+    except Exception as e:
+        print(f"Erreur lors du test de transformation SQL : {e}")
+        return False
+
+def test_bigquery_arrow_read():
+    """Teste la lecture projetee et filtree depuis BigQuery avec un client factice servant des lots Arrow"""
+    print("Test de la lecture Arrow depuis BigQuery")
+    
+    try:
+        import pyarrow as pa
+        from openfoodfacts_pipeline import get_data_from_bigquery, transform_predicate
+        
+        table = pa.table({
+            "code": ["0012345678905", "2", "3"],
+            "product_name": ["Pain", "Lait", "Soda"],
+            "nutriscore_grade": ["a", "b", "e"],
+            "energy_kcal": [250.0, 46.0, 42.0],
+            "sugars_100g": [2.0, 4.8, 10.6],
+            "url": ["u1", "u2", "u3"],
+            "is_deleted": [False, True, False],
+        })
+        
+        class FakeRows:
+            def __init__(self, sql):
+                self.columns = [name for name in table.column_names if f"`{name}`" in sql.split(" FROM ")[0]]
+            
+            def to_arrow_iterable(self, bqstorage_client=None):
+                # Seules les colonnes demandees sont servies, par lots de deux lignes
+                return iter(table.select(self.columns).to_batches(max_chunksize=2))
+        
+        source = bigquery.Table("projet.dataset.table")
+        source.schema = [bigquery.SchemaField(name, "STRING") for name in table.column_names]
+        client = FakeBigQueryClient(tables={"projet.dataset.table": source}, answer=FakeRows)
+        columns = ["code", "product_name", "nutriscore_grade", "energy_kcal", "sugars_100g", "fiber_100g"]
+        df = get_data_from_bigquery("projet.dataset.table", active_only=True, columns=columns,
+                                    where=transform_predicate, client=client)
+        sql = client.queries[0]
+        print(f"Requete : {sql}")
+        
+        return (
+            list(df.columns) == ["code", "product_name", "nutriscore_grade", "energy_kcal", "sugars_100g"]
+            and "`url`" not in sql and "is_deleted IS NOT TRUE" in sql and "`fiber_100g`" not in sql
+            and len(df) == 3 and str(df["energy_kcal"].dtype) == "float64"
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test de lecture Arrow : {e}")
+        return False
+
+def test_sqlite_warehouse():
+    """Teste le chargement, la fusion et la transformation dans l'entrepot SQLite local"""
+    print("Test de l'entrepot SQLite")
+    
+    try:
+        import tempfile
+        from openfoodfacts_pipeline import SQLiteWarehouse
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            warehouse = SQLiteWarehouse(os.path.join(tmp_dir, "entrepot.db"))
+            lot = pd.DataFrame({
+                "code": ["0012345678905", "2", "3"],
+                "product_name": ["Pain complet", "Lait", "Soda"],
+                "nutriscore_grade": ["a", "b", "e"],
+                "labels": ["Bio", "", None],
+                "energy_kcal": [250.0, 46.0, 42.0],
+                "sugars_100g": [2.0, 4.8, 10.6],
+                "saturated_fat_100g": [0.5, 1.0, 0.0],
+                "proteins_100g": [9.0, 3.2, 0.0],
+                "fiber_100g": [6.0, 0.0, 0.0],
+            })
+            # Premier chargement complet (truncate), avec un code en double
+            premier = os.path.join(tmp_dir, "premier.csv")
+            pd.concat([lot, lot.iloc[[1]]]).to_csv(premier, index=False)
+            
+            # Le second lot modifie un produit, en ajoute un et omet le produit 3
+            second = os.path.join(tmp_dir, "second.csv")
+            suite = lot.iloc[:2].copy()
+            suite.loc[1, "product_name"] = "Lait demi-ecreme"
+            pd.concat([suite, lot.iloc[[0]].assign(code="4")]).to_csv(second, index=False)
+            
+            warehouse.load(premier, "produits")
+            counts = warehouse.load(second, "produits", mode="upsert", soft_delete=True)
+            actifs = warehouse.read_table("produits", active_only=True, columns=["code", "product_name"])
+            transform = warehouse.transform("produits", "produits_transformes", active_only=True)
+            warehouse.connection.close()
+        
+        print(f"Compteurs : {counts}, transformation : {transform}")
+        return (
+            counts == {"inserted": 1, "updated": 1, "unchanged": 1, "deleted": 1}
+            and sorted(actifs["code"]) == ["0012345678905", "2", "4"]
+            and transform == {"source_rows": 3, "transformed_rows": 3}
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test de l'entrepot SQLite : {e}")
+        return False
+
+def test_nutriscore_computation():
+    """Teste le calcul vectorise du Nutri-Score sur des produits calcules a la main"""
+    print("Test du calcul du Nutri-Score")
+    
+    try:
+        import tempfile
+        from openfoodfacts_pipeline import compute_nutriscore, classify_nutriscore_series, save_nutriscore_disagreements
+        
+        # float32 comme dans le schema des produits : les valeurs egales a un seuil ne le depassent pas
+        df = pd.DataFrame({
+            "energy_kcal": [250.0, 536.0, 46.0, 80.0],
+            "sugars_100g": [2.0, 0.6, 4.8, 4.5],
+            "saturated_fat_100g": [0.5, 3.1, 1.0, 1.0],
+            "salt_100g": [1.1, 1.3, None, 0.225],
+            "fiber_100g": [6.0, 4.4, 0.0, None],
+            "proteins_100g": [9.0, 6.5, 3.2, 3.7],
+        }).astype("float32")
+        result = compute_nutriscore(df)
+        points = result["nutriscore_points"].tolist()
+        grades = result["nutriscore_calcule"].astype(object).tolist()
+        # 1 : 3 + 0 + 0 + 4 - 5 - 5 = -3 ; 2 : 14 points negatifs, proteines ignorees, 14 - 4 = 10
+        # 3 : sel manquant ; 4 : 0 + 0 + 0 + 0 - 0 - 2 = -2
+        print(f"Points : {points}, lettres : {grades}")
+        
+        qualite = classify_nutriscore_series(pd.Series(["b", None, "", "unknown"]), result["nutriscore_calcule"])
+        
+        # Seul le produit 1 (B dans l'API, A calcule) est en desaccord
+        transformed = pd.concat([pd.DataFrame({"code": ["1", "2", "3", "4"],
+                                               "nutriscore_grade": ["B", "C", "", "UNKNOWN"]}), result], axis=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_nutriscore_disagreements(transformed, os.path.join(tmp_dir, "transforme.csv"))
+            saved = pd.read_csv(os.path.join(tmp_dir, "transforme_nutriscore_desaccords.csv"), dtype=str)
+        return (
+            saved["code"].tolist() == ["1"] and saved["nutriscore_calcule"].tolist() == ["A"]
+            and points[0] == -3 and points[1] == 10 and pd.isna(points[2]) and points[3] == -2
+            and grades[:2] == ["A", "C"] and pd.isna(grades[2]) and grades[3] == "A"
+            and qualite.astype(object).tolist() == ["Bon", "Moyen", "Inconnu", "Excellent"]
+        )
+        
+    except Exception as e:
+        print(f"Erreur lors du test du calcul du Nutri-Score : {e}")
+        return False
+
 def test_data_directory():
     """Teste la structure du dossier data"""
     print("Test de la structure du dossier data")
@@ -164,7 +769,7 @@ def test_data_directory():
     
     # Lister les fichiers dans le dossier data
     files = os.listdir(DATA_DIR)
-    csv_files = [f for f in files if f.endswith('.csv')]
+    csv_files = [f for f in files if f.endswith(('.csv', '.parquet'))]
     
     print(f"Fichiers CSV trouves dans {DATA_DIR} :")
     for file in csv_files:
@@ -191,7 +796,17 @@ def test_configuration():
             print(f"  - URL API : {config['api']['url']}")
             print(f"  - Taille page : {config['api']['page_size']}")
             print(f"  - Nombre pages : {config['api']['num_pages']}")
-            
+
+            # Un type de champ supplementaire inconnu est refuse des la lecture de la configuration
+            from config.config import parse_field_specs
+            assert parse_field_specs("a=x.y:float, b") == [("a", "x.y", "float"), ("b", "b", "str")]
+            try:
+                parse_field_specs("c=x.z:int")
+            except ValueError as e:
+                print(f"  - Type inconnu refuse : {e}")
+            else:
+                raise AssertionError("Le type 'int' aurait du etre refuse")
+
             return True
         else:
             print("Configuration non chargee")
@@ -215,9 +830,9 @@ def main():
     test1 = test_data_directory()
     
     # Chemins des fichiers
-    csv_path = get_csv_path(config['files']['csv_original_filename'])
-    cleaned_csv_path = get_csv_path(config['files']['csv_cleaned_filename'])
-    transformed_csv_path = get_csv_path(config['files']['csv_transformed_filename'])
+    csv_path = get_stage_path(config['files']['csv_original_filename'])
+    cleaned_csv_path = get_stage_path(config['files']['csv_cleaned_filename'])
+    transformed_csv_path = get_stage_path(config['files']['csv_transformed_filename'])
     
     # Test 2: Chargement du fichier CSV original
     print("\n2. Test du fichier CSV original")
@@ -239,6 +854,58 @@ def main():
     print("\n6. Test de la qualite des donnees")
     test6 = test_data_quality(csv_path if test2 else cleaned_csv_path)
     
+    # Test 7: Nettoyage vectorise
+    print("\n7. Test du nettoyage vectorise")
+    test7 = test_clean_text_vectorized()
+    
+    # Test 8: Chargement Parquet vers BigQuery (client factice)
+    print("\n8. Test du chargement Parquet BigQuery")
+    test8 = test_bigquery_parquet_load()
+    
+    # Test 9: Transformation SQL equivalente (SQLite)
+    print("\n9. Test de la transformation SQL")
+    test9 = test_sql_transformation()
+    
+    # Test 10: Lecture projetee depuis BigQuery (client factice)
+    print("\n10. Test de la lecture Arrow BigQuery")
+    test10 = test_bigquery_arrow_read()
+    
+    # Test 11: Entrepot SQLite local
+    print("\n11. Test de l'entrepot SQLite")
+    test11 = test_sqlite_warehouse()
+    
+    # Test 12: Calcul vectorise du Nutri-Score
+    print("\n12. Test du calcul du Nutri-Score")
+    test12 = test_nutriscore_computation()
+    
+    # Test 13: Nutriments non numeriques
+    print("\n13. Test des nutriments invalides")
+    test13 = test_invalid_nutrients_cleaning()
+    
+    # Test 14: Fusion vers BigQuery (client factice)
+    print("\n14. Test de la fusion BigQuery")
+    test14 = test_bigquery_upsert()
+    
+    # Test 15: Etapes CSV et Parquet equivalentes
+    print("\n15. Test des etapes CSV et Parquet")
+    test15 = test_csv_parquet_stages()
+    
+    # Test 16: Decodage JSON incremental
+    print("\n16. Test du decodage JSON par morceaux")
+    test16 = test_json_stream_chunks()
+    
+    # Test 17: Relecture du cache hors ligne sans limitation de debit
+    print("\n17. Test du cache hors ligne")
+    test17 = test_offline_cache_not_throttled()
+    
+    # Test 18: Export TSV avec un guillemet isole
+    print("\n18. Test de l'export TSV")
+    test18 = test_dump_stray_quote()
+    
+    # Test 19: Entrepot BigQuery indisponible
+    print("\n19. Test de l'entrepot sans connexion")
+    test19 = test_warehouse_without_connection()
+    
     # Resume des tests
     print("\n" + "=" * 50)
     print("Resume des tests :")
@@ -249,8 +916,21 @@ def main():
     print(f"  CSV transforme : {'OK' if test4 else 'N/A'}")
     print(f"  BigQuery : {'OK' if test5 else 'ECHEC'}")
     print(f"  Qualite donnees : {'OK' if test6 else 'ECHEC'}")
+    print(f"  Nettoyage vectorise : {'OK' if test7 else 'ECHEC'}")
+    print(f"  Chargement Parquet : {'OK' if test8 else 'ECHEC'}")
+    print(f"  Transformation SQL : {'OK' if test9 else 'ECHEC'}")
+    print(f"  Lecture Arrow : {'OK' if test10 else 'ECHEC'}")
+    print(f"  Entrepot SQLite : {'OK' if test11 else 'ECHEC'}")
+    print(f"  Calcul Nutri-Score : {'OK' if test12 else 'ECHEC'}")
+    print(f"  Nutriments invalides : {'OK' if test13 else 'ECHEC'}")
+    print(f"  Fusion BigQuery : {'OK' if test14 else 'ECHEC'}")
+    print(f"  Etapes CSV et Parquet : {'OK' if test15 else 'ECHEC'}")
+    print(f"  Decodage JSON par morceaux : {'OK' if test16 else 'ECHEC'}")
+    print(f"  Cache hors ligne : {'OK' if test17 else 'ECHEC'}")
+    print(f"  Export TSV : {'OK' if test18 else 'ECHEC'}")
+    print(f"  Entrepot sans connexion : {'OK' if test19 else 'ECHEC'}")
     
-    if all([test0, test1, test2, test5, test6]):
+    if all([test0, test1, test2, test5, test6, test7, test8, test9, test10, test11, test12, test13, test14, test15, test16, test17, test18, test19]):
         print("\nTous les tests sont passes avec succes !")
     else:
         print("\nCertains tests ont echoue. Verifiez les erreurs ci-dessus.")